@@ -0,0 +1,53 @@
+"""Beverage planning engine.
+
+    from app import RecommendationEngine
+    RecommendationEngine().calculate_total_drinks(50, 20, {"BEER": ["IPA"]})
+
+Importing the package loads nothing: every name below is imported from its module on
+first access, and the engine core (recommendation_engine, results, lru_cache, plan,
+plan_store, answer_table lookups) only needs the standard library. numpy is loaded by
+the batch, sweep and optimizer paths when they are first used; streamlit only by the
+UI in app.py (``streamlit run app/app.py``).
+"""
+import importlib
+
+_EXPORTS = {
+    "RecommendationEngine": "recommendation_engine",
+    "CompiledConfig": "recommendation_engine",
+    "compile_config": "recommendation_engine",
+    "config": "recommendation_engine",
+    "apportion": "recommendation_engine",
+    "CategoryResult": "results",
+    "PlanResult": "results",
+    "to_json": "results",
+    "encode_binary": "results",
+    "decode_binary": "results",
+    "ColumnarPlans": "results",
+    "Plan": "plan",
+    "PlanStore": "plan_store",
+    "AnswerTable": "answer_table",
+    "ConfigStore": "config_store",
+    "DemandLedger": "demand",
+    "LiveForecast": "live",
+    "BatchBuffers": "batch_buffers",
+    "SubcategoryIndex": "subcategory_index",
+    "TrafficRecorder": "traffic",
+    "Instrumentation": "instrumentation",
+    "CATEGORY_MAP": "categories",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Cache it so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
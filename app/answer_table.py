@@ -0,0 +1,270 @@
+"""Precomputed, memory-mapped category totals for the UI input domain.
+
+The Streamlit form only accepts whole numbers of attendees and whole-dollar budgets up
+to 1000 each, and there are only a handful of category sets, so every category-level
+answer of that domain can be computed once. For each category set and each category
+in it the table stores
+
+    total_units    int32[attendees]              units only depend on the attendee count
+    per_unit_cost  uint16/uint32[attendees, budget]
+
+A RecommendationEngine given an AnswerTable looks those two numbers up instead of
+computing them whenever the request is inside the domain; the subcategory split is
+still done live because it depends on the subcategory lists. Reading a table only
+needs the standard library; numpy is imported by build and verify. Tables carry a
+fingerprint of the config they were built from and an engine refuses a table built
+for another config.
+
+    python -m app.answer_table build answers.anstab            # ~25 MB for the default domain
+    python -m app.answer_table verify answers.anstab --samples 20000
+
+Layout (little-endian):
+    header      magic, version, config fingerprint, domain, cost item size, counts
+    categories  "\\n"-joined category names; masks below are bits in this order
+    directory   per (category set, category): set mask, category index, array offsets
+    arrays      8-byte aligned units and cost columns
+"""
+import argparse
+import itertools
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+from .binary_files import align, close_mapped
+from .recommendation_engine import RecommendationEngine
+
+MAGIC = b"ANSTAB01"
+VERSION = 1
+# magic, version, fingerprint, max attendees, max budget, cost item size, directory entries,
+# category names length
+HEADER = struct.Struct("<8sI32sIIIII")
+DIRECTORY_ENTRY = struct.Struct("<IIQQ")
+
+MAX_ATTENDEES = 1000
+MAX_BUDGET = 1000
+
+
+class AnswerTableError(ValueError):
+    pass
+
+
+def category_sets(compiled):
+    # Every non-empty set of allocation categories that plans at least one category
+    names = sorted(compiled.allocation_categories)
+    for size in range(1, len(names) + 1):
+        for category_set in itertools.combinations(names, size):
+            if any(cat in compiled.coefficients for cat in category_set):
+                yield category_set
+
+
+def build_table(path, engine=None, max_attendees=MAX_ATTENDEES, max_budget=MAX_BUDGET):
+    # Materializes the domain with RecommendationEngine.sweep, one category set at a time
+    import numpy as np
+
+    engine = engine or RecommendationEngine()
+    compiled = engine.compiled
+    names = sorted(compiled.allocation_categories)
+    attendees = np.arange(1, max_attendees + 1)
+    budgets = np.arange(1, max_budget + 1)
+
+    grids = []
+    largest_cost = 0
+    for category_set in category_sets(compiled):
+        grid = engine.sweep(attendees, budgets, category_set)
+        for category, columns in grid["data"].items():
+            largest_cost = max(largest_cost, int(columns["per_unit_cost"].max()))
+            grids.append((category_set, category, columns))
+    cost_dtype = np.dtype("<u2") if largest_cost <= 0xFFFF else np.dtype("<u4")
+
+    names_blob = "\n".join(names).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        f.write(names_blob)
+        directory_at = align(f)
+        f.write(b"\0" * (DIRECTORY_ENTRY.size * len(grids)))
+
+        entries = []
+        for category_set, category, columns in grids:
+            units_at = align(f)
+            f.write(columns["total_units"][:, 0].astype("<i4").tobytes())
+            costs_at = align(f)
+            f.write(columns["per_unit_cost"].astype(cost_dtype).tobytes())
+            mask = sum(1 << names.index(cat) for cat in category_set)
+            entries.append(DIRECTORY_ENTRY.pack(mask, names.index(category), units_at, costs_at))
+
+        f.seek(directory_at)
+        f.write(b"".join(entries))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, compiled.fingerprint, max_attendees, max_budget,
+                            cost_dtype.itemsize, len(entries), len(names_blob)))
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class AnswerTable:
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise AnswerTableError("answer tables are little-endian; big-endian hosts are not supported")
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise AnswerTableError(f"{path}: empty answer table")
+        self._view = view = memoryview(self._mmap)
+
+        # (category set, category) -> (units column, cost grid), both zero-copy views of the mmap
+        self.columns = {}
+        try:
+            self._read(view)
+        except Exception:
+            self.close()
+            raise
+
+    def _read(self, view):
+        # Header and directory, after checking that every section they describe lies inside
+        # the file, so a truncated or corrupt table fails here instead of in lookup
+        size = len(view)
+        if size < HEADER.size:
+            raise AnswerTableError(f"{self.path}: truncated answer table ({size} bytes, header alone is "
+                                   f"{HEADER.size})")
+        (magic, version, self.fingerprint, self.max_attendees, self.max_budget, cost_size, entry_count,
+         names_length) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise AnswerTableError(f"{self.path}: not a version {VERSION} answer table")
+        if cost_size not in (2, 4):
+            raise AnswerTableError(f"{self.path}: unsupported cost item size {cost_size}")
+        directory_at = HEADER.size + names_length + (-(HEADER.size + names_length) % 8)
+        if directory_at + DIRECTORY_ENTRY.size * entry_count > size:
+            raise AnswerTableError(f"{self.path}: truncated answer table: directory ends at byte "
+                                   f"{directory_at + DIRECTORY_ENTRY.size * entry_count}, file has {size}")
+        try:
+            names = str(view[HEADER.size:HEADER.size + names_length], "utf-8").split("\n")
+        except UnicodeDecodeError:
+            raise AnswerTableError(f"{self.path}: corrupt category names")
+
+        cells = self.max_attendees * self.max_budget
+        for index in range(entry_count):
+            mask, category_index, units_at, costs_at = DIRECTORY_ENTRY.unpack_from(
+                view, directory_at + index * DIRECTORY_ENTRY.size)
+            if category_index >= len(names):
+                raise AnswerTableError(f"{self.path}: directory entry {index} names category {category_index}, "
+                                       f"table has {len(names)}")
+            for name, at, length in (("units", units_at, 4 * self.max_attendees),
+                                     ("costs", costs_at, cost_size * cells)):
+                if at + length > size:
+                    raise AnswerTableError(f"{self.path}: truncated answer table: {name} of entry {index} end "
+                                           f"at byte {at + length}, file has {size}")
+            category_set = frozenset(name for bit, name in enumerate(names) if mask >> bit & 1)
+            units = view[units_at:units_at + 4 * self.max_attendees].cast("i")
+            costs = view[costs_at:costs_at + cost_size * cells].cast("H" if cost_size == 2 else "I")
+            self.columns[(category_set, names[category_index])] = (units, costs)
+
+    def close(self):
+        views = [view for columns in self.columns.values() for view in columns]
+        self.columns.clear()
+        close_mapped(views + [self._view], self._mmap, self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def matches(self, compiled):
+        return self.fingerprint == compiled.fingerprint
+
+    def covers(self, number_of_attendees, per_person_budget):
+        # In the domain: the engine's int(attendees) / float(budget) land on a table cell
+        attendees = int(number_of_attendees)
+        budget = float(per_person_budget)
+        return 1 <= attendees <= self.max_attendees and 1 <= budget <= self.max_budget and budget.is_integer()
+
+    def lookup(self, category_set, category, number_of_attendees, per_person_budget):
+        # (total_units, per_unit_cost) for a covered request, or None for an unknown set
+        columns = self.columns.get((category_set, category))
+        if columns is None:
+            return None
+        units, costs = columns
+        row = int(number_of_attendees) - 1
+        return units[row], costs[row * self.max_budget + int(per_person_budget) - 1]
+
+
+def verify_table(table, engine=None, samples=10000, seed=0):
+    # Compares every cell against RecommendationEngine.sweep, then spot-checks random cells
+    # against calculate_total_drinks itself. Returns a list of mismatch descriptions.
+    import numpy as np
+
+    engine = engine or RecommendationEngine()
+    if not table.matches(engine.compiled):
+        return ["table was built for a different config"]
+
+    mismatches = []
+    attendees = np.arange(1, table.max_attendees + 1)
+    budgets = np.arange(1, table.max_budget + 1)
+    expected_keys = set()
+    for category_set in category_sets(engine.compiled):
+        grid = engine.sweep(attendees, budgets, category_set)
+        for category, columns in grid["data"].items():
+            key = (frozenset(category_set), category)
+            expected_keys.add(key)
+            if key not in table.columns:
+                mismatches.append(f"{sorted(category_set)} {category}: missing from table")
+                continue
+            units, costs = table.columns[key]
+            if not np.array_equal(np.asarray(units), columns["total_units"][:, 0]):
+                mismatches.append(f"{sorted(category_set)} {category}: total_units differ")
+            if not np.array_equal(np.asarray(costs).reshape(len(attendees), len(budgets)),
+                                  columns["per_unit_cost"]):
+                mismatches.append(f"{sorted(category_set)} {category}: per_unit_cost differs")
+    mismatches.extend(f"{sorted(key[0])} {key[1]}: unexpected entry" for key in table.columns.keys() - expected_keys)
+
+    rng = random.Random(seed)
+    keys = sorted(expected_keys, key=lambda key: (sorted(key[0]), key[1]))
+    for _ in range(samples if keys else 0):
+        category_set, category = rng.choice(keys)
+        n = rng.randint(1, table.max_attendees)
+        b = rng.randint(1, table.max_budget)
+        result = engine.calculate_total_drinks(n, b, {cat: ["sample"] for cat in sorted(category_set)})
+        item = next(item for item in result["data"] if item["category"] == category)
+        if table.lookup(category_set, category, n, b) != (item["total_units"], item["per_unit_cost"]):
+            mismatches.append(f"{sorted(category_set)} {category} at ({n}, {b}): table "
+                              f"{table.lookup(category_set, category, n, b)} != engine "
+                              f"{(item['total_units'], item['per_unit_cost'])}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the precomputed answer table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="materialize the input domain into a table file")
+    build.add_argument("table")
+    build.add_argument("--attendees", type=int, default=MAX_ATTENDEES, help="largest attendee count")
+    build.add_argument("--budget", type=int, default=MAX_BUDGET, help="largest per-person budget")
+    verify = commands.add_parser("verify", help="check a table against the live engine")
+    verify.add_argument("table")
+    verify.add_argument("--samples", type=int, default=10000, help="random cells checked with calculate_total_drinks")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "build":
+        entries = build_table(args.table, max_attendees=args.attendees, max_budget=args.budget)
+        print(f"wrote {entries} category grids ({os.path.getsize(args.table) / 1e6:.1f} MB) to {args.table} "
+              f"in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    with AnswerTable(args.table) as table:
+        mismatches = verify_table(table, samples=args.samples)
+    for mismatch in mismatches[:20]:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatches in {time.perf_counter() - started:.1f}s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Caller-owned output and scratch buffers for the batch path.
+
+calculate_total_drinks_batch(..., out=BatchBuffers(...)) computes straight into
+preallocated memory: every intermediate goes through a ufunc ``out=`` into scratch
+arrays owned by the buffers, and results land in
+
+    out.results[category]       structured BATCH_DTYPE array, one record per event
+    out.subcategories[category] int64 [events, subcategories] unit counts
+
+so re-planning job after job reuses the same memory and allocates nothing per event
+(benchmarks/bench_batch_buffers.py checks this with tracemalloc). Results and counts
+can also live in memory the caller owns, e.g. a bytearray, an ``array.array`` or a
+shared mmap, sized with BatchBuffers.nbytes:
+
+    buffer = bytearray(BatchBuffers.nbytes(["BEER", "WINE"], 10000, {"BEER": 3, "WINE": 2}))
+    out = BatchBuffers(["BEER", "WINE"], 10000, {"BEER": 3, "WINE": 2}, buffer=buffer)
+    engine.calculate_total_drinks_batch(attendees, budgets, selected, out=out)
+    out.results["BEER"]["per_unit_cost"][:len(attendees)]
+
+Subcategory counts follow allocate_subcategories: equal weights split like the scalar
+path, integer weights (shape [subcategories] or [events, subcategories], 0 meaning not
+ordered) use the same largest-remainder rule as apportion_batch. Float weights work
+too but are scaled to integers with temporary arrays, so pass integer_weights() output
+when allocation matters.
+"""
+import numpy as np
+
+from .recommendation_engine import integer_weights
+
+BATCH_DTYPE = np.dtype([
+    ("selected", "?"),
+    ("consumers", "<i8"),
+    ("budget", "<i8"),
+    ("total_units", "<i8"),
+    ("per_unit_cost", "<i8"),
+], align=True)
+
+
+class BatchBuffers:
+    def __init__(self, categories, capacity, subcategory_counts=None, buffer=None):
+        # categories: the engine categories to compute; subcategory_counts: category ->
+        # number of subcategory columns (categories left out get no counts)
+        self.categories = tuple(categories)
+        self.capacity = capacity
+        self.subcategory_counts = dict(subcategory_counts or {})
+        self.size = 0
+
+        memory = (np.frombuffer(buffer, dtype=np.uint8, count=self.nbytes(categories, capacity, subcategory_counts))
+                  if buffer is not None else np.zeros(self.nbytes(categories, capacity, subcategory_counts), np.uint8))
+        offset = 0
+        self.results = {}
+        for category in self.categories:
+            size = BATCH_DTYPE.itemsize * capacity
+            self.results[category] = memory[offset:offset + size].view(BATCH_DTYPE)
+            offset += size
+        self.subcategories = {}
+        for category, count in self.subcategory_counts.items():
+            size = 8 * capacity * count
+            self.subcategories[category] = memory[offset:offset + size].view(np.int64).reshape(capacity, count)
+            offset += size
+
+        # Scratch space, private to the buffers
+        scratch = lambda dtype=np.float64: np.empty(capacity, dtype)  # noqa: E731
+        self.attendees = scratch()
+        self.budgets = scratch()
+        self.spend = scratch()
+        self.consumers = scratch()
+        self.budget = scratch()
+        self.units = scratch()
+        self.term = scratch()
+        self.cost = scratch()
+        self.total_percentage = scratch()
+        self.has_value = scratch(bool)
+        self.selected = {category: scratch(bool) for category in self.categories}
+        self.fractions = {(kind, category): scratch() for kind in ("budget", "head") for category in self.categories}
+        widest = max(self.subcategory_counts.values(), default=1)
+        self.totals = scratch(np.int64)
+        self.leftover = scratch(np.int64)
+        self.weight_total = scratch(np.int64)
+        self.threshold = scratch(np.int64)
+        self.columns = np.arange(widest, dtype=np.int64)
+        self.numerators = np.empty(capacity * widest, np.int64)
+        self.remainders = np.empty(capacity * widest, np.int64)
+        self.weights = np.empty(capacity * widest, np.int64)
+        self.extra = np.empty(capacity * widest, np.int64)
+        self.selection = np.empty(capacity * (2 * widest - 1), np.int64)
+
+    @staticmethod
+    def nbytes(categories, capacity, subcategory_counts=None):
+        return (BATCH_DTYPE.itemsize * capacity * len(tuple(categories))
+                + 8 * capacity * sum((subcategory_counts or {}).values()))
+
+
+def _fractions(engine, out, n, categories, allocation_config, kind):
+    # recalculate_allocation_fractions_batch into out.fractions[(kind, category)], summing
+    # the percentages in the same order (categories without buffers still take their share)
+    total = out.total_percentage[:n]
+    total.fill(0)
+    for category in allocation_config:
+        if category not in engine.compiled.coefficients:
+            continue
+        if category in out.selected:
+            fraction = out.fractions[(kind, category)][:n]
+            np.multiply(out.selected[category][:n], allocation_config[category], out=fraction)
+        else:
+            fraction = out.term[:n]
+            np.copyto(fraction, categories.get(category, False), casting="unsafe")
+            np.multiply(fraction, allocation_config[category], out=fraction)
+        np.add(total, fraction, out=total)
+    has_total = np.greater(total, 0, out=out.has_value[:n])
+    for category in out.categories:
+        fraction = out.fractions[(kind, category)][:n]
+        np.divide(fraction, total, out=fraction, where=has_total)
+        np.multiply(fraction, 100, out=fraction)
+        np.divide(fraction, 100, out=fraction)
+
+
+def _units(engine, out, n, category):
+    # _units_batch into out.units, same operation order as the scalar path
+    consumers = out.consumers[:n]
+    units = out.units[:n]
+    term = out.term[:n]
+    units.fill(0)
+    for per_person, allocation in engine.compiled.coefficients[category]:
+        np.multiply(consumers, per_person, out=term)
+        np.multiply(term, allocation, out=term)
+        if category == "BEER":
+            np.ceil(term, out=term)
+        np.add(units, term, out=units)
+    if category == "LIQUOR":
+        np.divide(units, engine.bottle_size, out=units)
+        np.ceil(units, out=units)
+        np.maximum(units, 1, out=units)
+    return units
+
+
+def _apportion(out, n, totals, weights, counts):
+    # apportion_batch without temporaries: floor shares, then the leftover units go to the
+    # largest remainders (first index wins ties)
+    k = counts.shape[1]
+    numerators = out.numerators[:n * k].reshape(n, k)
+    remainders = out.remainders[:n * k].reshape(n, k)
+    weight_total = out.weight_total[:n]
+    leftover = out.leftover[:n]
+    has_weight = out.has_value[:n]
+    np.sum(weights, axis=1, out=weight_total)
+    np.greater(weight_total, 0, out=has_weight)
+    np.maximum(weight_total, 1, out=weight_total)
+
+    np.multiply(totals[:, None], weights, out=numerators)
+    np.floor_divide(numerators, weight_total[:, None], out=counts)
+    np.multiply(counts, weight_total[:, None], out=remainders)
+    np.subtract(numerators, remainders, out=remainders)
+    # Rows without any weight keep zero counts (apportion_batch does the same)
+    np.sum(counts, axis=1, out=leftover)
+    np.subtract(totals, leftover, out=leftover)
+    np.multiply(leftover, has_weight, out=leftover)
+
+    if k == 1:
+        return
+    # The key (W - remainder) * k + column is smallest for the largest remainder and, among
+    # equal ones, for the lowest column; keys are distinct within a row, and the `leftover`
+    # smallest of them get one more unit.
+    columns = out.columns[:k]
+    np.subtract(weight_total[:, None], remainders, out=remainders)
+    np.multiply(remainders, k, out=remainders)
+    np.add(remainders, columns, out=remainders)
+    # Select (not sort) the leftover-th smallest key of every row with one in-place
+    # partition at a fixed kth: each row is padded with k - 1 - leftover keys of -1 and
+    # fills the rest of its k - 1 padding columns with keys above all others, so position
+    # k - 2 holds that key (or -1 for rows without leftover).
+    selection = out.selection[:n * (2 * k - 1)].reshape(n, 2 * k - 1)
+    np.copyto(selection[:, :k], remainders)
+    padding = selection[:, k:]
+    below = np.subtract(k - 1, leftover, out=weight_total)
+    np.less(columns[:k - 1], below[:, None], out=padding)
+    np.subtract(1, padding, out=padding)
+    np.multiply(padding, np.iinfo(np.int64).max, out=padding)
+    np.subtract(padding, 1, out=padding)
+    selection.partition(k - 2, axis=1)
+    threshold = out.threshold[:n]
+    np.copyto(threshold, selection[:, k - 2])
+    extra = np.less_equal(remainders, threshold[:, None], out=out.extra[:n * k].reshape(n, k))
+    np.add(counts, extra, out=counts)
+
+
+def fill_batch(engine, out, number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+    # The body of calculate_total_drinks_batch(..., out=out); returns out with out.size set
+    n = len(number_of_attendees)
+    if n > out.capacity:
+        raise ValueError(f"{n} events do not fit in buffers of capacity {out.capacity}")
+    unknown = set(out.categories) - set(engine.compiled.coefficients)
+    if unknown:
+        raise ValueError(f"buffers hold categories the engine does not plan: {sorted(unknown)}")
+    out.size = n
+
+    attendees = out.attendees[:n]
+    budgets = out.budgets[:n]
+    spend = out.spend[:n]
+    np.copyto(attendees, number_of_attendees, casting="unsafe")
+    # Attendee counts are whole numbers on the scalar path (int(number_of_attendees))
+    np.trunc(attendees, out=attendees)
+    np.copyto(budgets, per_person_budget, casting="unsafe")
+    np.multiply(attendees, budgets, out=spend)
+    for category in out.categories:
+        np.copyto(out.selected[category][:n], categories.get(category, False), casting="unsafe")
+
+    _fractions(engine, out, n, categories, engine.compiled.budget_allocation, "budget")
+    _fractions(engine, out, n, categories, engine.compiled.head_allocation, "head")
+
+    for category in out.categories:
+        selected = out.selected[category][:n]
+        consumers = np.multiply(attendees, out.fractions[("head", category)][:n], out=out.consumers[:n])
+        np.ceil(consumers, out=consumers)
+        budget = np.multiply(spend, out.fractions[("budget", category)][:n], out=out.budget[:n])
+        np.ceil(budget, out=budget)
+
+        units = _units(engine, out, n, category)
+        cost = out.cost[:n]
+        cost.fill(0)
+        has_units = np.greater(units, 0, out=out.has_value[:n])
+        np.divide(budget, units, out=cost, where=has_units)
+        np.ceil(cost, out=cost)
+        np.trunc(units, out=units)
+
+        record = out.results[category][:n]
+        record["selected"] = selected
+        for field, values in (("consumers", consumers), ("budget", budget), ("total_units", units),
+                              ("per_unit_cost", cost)):
+            np.multiply(values, selected, out=values)
+            np.copyto(record[field], values, casting="unsafe")
+
+        counts = out.subcategories.get(category)
+        if counts is not None:
+            k = counts.shape[1]
+            weights = out.weights[:n * k].reshape(n, k)
+            category_weights = (subcategory_weights or {}).get(category)
+            if category_weights is None:
+                weights.fill(1)
+            else:
+                category_weights = np.asarray(category_weights)
+                if not np.issubdtype(category_weights.dtype, np.integer):
+                    category_weights = np.asarray([integer_weights(list(row)) for row in np.atleast_2d(
+                        category_weights).tolist()]).reshape(category_weights.shape)
+                np.copyto(weights, category_weights, casting="unsafe")
+            totals = out.totals[:n]
+            np.copyto(totals, record["total_units"])
+            _apportion(out, n, totals, weights, counts[:n])
+    return out
@@ -0,0 +1,199 @@
+"""Headless batch planner: one event per JSONL input line, one compact result line out.
+
+    python -m app.batch_planner events.jsonl -o plans.jsonl --checkpoint plans.ckpt
+    cat events.jsonl | python -m app.batch_planner - > plans.jsonl
+
+Input lines look like
+    {"event_id": "e1", "number_of_attendees": 50, "per_person_budget": 20,
+     "categories": {"LIQUOR": ["WHISKEY", "VODKA"], "BEER": ["IPA"]},
+     "subcategory_weights": {"WHISKEY": 2}}   # optional popularity weights
+
+Events are streamed through a generator pipeline, so memory stays flat whatever the
+input size. Output is flushed every --batch-size events and, when --checkpoint is
+given, the input/output offsets are recorded right after each flush. Re-running the
+same command after a crash picks up from the last checkpoint.
+"""
+import argparse
+import contextlib
+import json
+import math
+import numbers
+import os
+import sys
+
+from .recommendation_engine import RecommendationEngine
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {"input_offset": 0, "output_offset": 0, "events": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, input_offset, output_offset, events):
+    # Write-then-rename so a crash never leaves a half written checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"input_offset": input_offset, "output_offset": output_offset, "events": events}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_lines(stream, start_offset=0):
+    # Yields (offset after the line, raw line). Seekable inputs jump straight to
+    # start_offset, pipes are fast-forwarded by reading past the already planned bytes.
+    offset = start_offset
+    if start_offset and stream.seekable():
+        stream.seek(start_offset)
+    else:
+        offset = 0
+        while offset < start_offset:
+            line = stream.readline()
+            if not line:
+                return
+            offset += len(line)
+
+    for line in stream:
+        offset += len(line)
+        yield offset, line
+
+
+def parse_events(lines):
+    for offset, line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield offset, json.loads(line), None
+        except ValueError as e:
+            yield offset, None, f"invalid JSON: {e}"
+
+
+def _is_number(value):
+    # JSON allows NaN and Infinity, neither of which plans to anything; nor does an int too
+    # large to become a float
+    try:
+        return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+    except OverflowError:
+        return False
+
+
+def validate_event(event):
+    # The reason an event cannot be planned, or None. Checked up front so one malformed
+    # line becomes an error record instead of a crash (or a nonsense plan) mid-run.
+    if not isinstance(event, dict):
+        return "event must be a JSON object"
+    for field in ("number_of_attendees", "per_person_budget"):
+        if field not in event:
+            return f"missing {field}"
+        if not _is_number(event[field]) or not event[field] > 0:
+            return f"{field} must be a positive number"
+    categories = event.get("categories")
+    if not isinstance(categories, dict):
+        return "categories must be an object of subcategory lists"
+    for category, subcategories in categories.items():
+        if not isinstance(subcategories, list) or not all(isinstance(name, str) for name in subcategories):
+            return f"subcategories of {category} must be a list of strings"
+    weights = event.get("subcategory_weights")
+    if weights is not None:
+        if not isinstance(weights, dict):
+            return "subcategory_weights must be an object"
+        for subcategory, weight in weights.items():
+            if not _is_number(weight) or not weight >= 0:
+                return f"weight of {subcategory} must be a non-negative number"
+    return None
+
+
+def plan_events(engine, events):
+    for offset, event, error in events:
+        event_id = event.get("event_id") if isinstance(event, dict) else None
+        if error is None:
+            error = validate_event(event)
+        if error is None:
+            try:
+                result = engine.calculate_total_drinks(
+                    event["number_of_attendees"],
+                    event["per_person_budget"],
+                    event["categories"],
+                    event.get("subcategory_weights")
+                )
+                output = {"event_id": event_id, "data": result["data"]}
+            except (AttributeError, KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                output = {"event_id": event_id, "error": f"{type(e).__name__}: {e}"}
+        else:
+            output = {"event_id": event_id, "error": error}
+        yield offset, (json.dumps(output, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def write_results(outputs, out, batch_size, checkpoint_path=None, output_offset=0, events_done=0):
+    pending = 0
+    input_offset = None
+    for input_offset, line in outputs:
+        out.write(line)
+        output_offset += len(line)
+        events_done += 1
+        pending += 1
+        if pending >= batch_size:
+            _flush(out, checkpoint_path, input_offset, output_offset, events_done)
+            pending = 0
+
+    if pending and input_offset is not None:
+        _flush(out, checkpoint_path, input_offset, output_offset, events_done)
+    return events_done
+
+
+def _flush(out, checkpoint_path, input_offset, output_offset, events_done):
+    out.flush()
+    if checkpoint_path:
+        with contextlib.suppress(OSError, ValueError):
+            os.fsync(out.fileno())
+        write_checkpoint(checkpoint_path, input_offset, output_offset, events_done)
+
+
+def open_output(path, output_offset):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdout.buffer)
+    if output_offset and os.path.exists(path):
+        # Drop anything written after the last checkpoint, then append from there
+        out = open(path, "r+b")
+        out.truncate(output_offset)
+        out.seek(output_offset)
+        return out
+    return open(path, "wb")
+
+
+def open_input(path):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin.buffer)
+    return open(path, "rb")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan every event of a JSONL calendar.")
+    parser.add_argument("input", help="JSONL file with one event per line, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="result JSONL file, or - for stdout (default)")
+    parser.add_argument("--checkpoint", help="checkpoint file used to resume an interrupted run")
+    parser.add_argument("--batch-size", type=int, default=1000, help="events per output flush/checkpoint")
+    parser.add_argument("--cache-size", type=int, default=10000, help="engine LRU cache size, 0 disables it")
+    args = parser.parse_args(argv)
+
+    checkpoint = read_checkpoint(args.checkpoint)
+
+    engine = RecommendationEngine(cache_size=args.cache_size)
+
+    with open_input(args.input) as stream, open_output(args.output, checkpoint["output_offset"]) as out:
+        lines = read_lines(stream, checkpoint["input_offset"])
+        outputs = plan_events(engine, parse_events(lines))
+        events_done = write_results(outputs, out, args.batch_size, args.checkpoint,
+                                    checkpoint["output_offset"], checkpoint["events"])
+
+    # A finished run leaves nothing to resume
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    print(f"planned {events_done} events", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# Helpers shared by the binary file formats (catalog, answer table, columnar plans)
+
+
+def align(f, boundary=8):
+    # Pads a file being written to the next boundary; returns the aligned offset
+    padding = -f.tell() % boundary
+    if padding:
+        f.write(b"\0" * padding)
+    return f.tell()
+
+
+def release_views(views):
+    # Every view exported from a buffer has to be released before the buffer (e.g. an
+    # mmap) can be closed
+    for view in views:
+        view.release()
+
+
+def close_mapped(views, mapped, file):
+    release_views(views)
+    mapped.close()
+    file.close()
@@ -0,0 +1,260 @@
+"""Memory-mapped SKU catalog with per-subcategory price indexes.
+
+The on-disk file is columnar. Rows are sorted by (category, subcategory, price), so
+every subcategory owns a contiguous, price-sorted slice of the price column and
+finding the SKUs nearest a target unit price is a bisect inside that slice. Opening
+a catalog only reads the header and the small subcategory directory; the columns
+are mmapped and decoded on access.
+
+    python -m app.catalog build skus.csv catalog.skucat    # csv: sku,name,category,subcategory,price
+    python -m app.catalog nearest catalog.skucat BEER IPA 2.5
+
+Layout (little-endian):
+    header      magic, version, row count, subcategory count, section offsets
+    directory   per subcategory: first row, end row, category/subcategory name offsets
+    prices      float64[rows]
+    sku         uint32 offsets[rows + 1] + utf-8 blob
+    name        uint32 offsets[rows + 1] + utf-8 blob
+    dir names   uint32 offsets + utf-8 blob for the directory strings
+"""
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+from typing import NamedTuple
+
+from .binary_files import align, close_mapped
+
+MAGIC = b"SKUCAT01"
+VERSION = 1
+# magic, version, rows, subcategories, then offsets of: directory, prices, sku offsets,
+# sku blob, name offsets, name blob, directory name offsets, directory name blob
+HEADER = struct.Struct("<8sIII8Q")
+DIRECTORY_ENTRY = struct.Struct("<IIII")
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class Sku(NamedTuple):
+    row: int
+    sku: str
+    name: str
+    category: str
+    subcategory: str
+    price: float
+
+
+def _write_strings(f, values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    offsets_at = align(f)
+    f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+    blob_at = align(f)
+    f.write(b"".join(encoded))
+    return offsets_at, blob_at
+
+
+def write_catalog(path, records):
+    # records: iterable of (sku, name, category, subcategory, price)
+    rows = sorted(((str(category), str(subcategory), float(price), str(sku), str(name))
+                   for sku, name, category, subcategory, price in records))
+
+    directory = []
+    for row, (category, subcategory, *_rest) in enumerate(rows):
+        if not directory or directory[-1][0:2] != [category, subcategory]:
+            directory.append([category, subcategory, row, row + 1])
+        else:
+            directory[-1][3] = row + 1
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+
+        directory_at = align(f)
+        for index, (_, _, start, end) in enumerate(directory):
+            f.write(DIRECTORY_ENTRY.pack(start, end, 2 * index, 2 * index + 1))
+
+        prices_at = align(f)
+        f.write(struct.pack(f"<{len(rows)}d", *(row[2] for row in rows)))
+        sku_offsets_at, sku_blob_at = _write_strings(f, (row[3] for row in rows))
+        name_offsets_at, name_blob_at = _write_strings(f, (row[4] for row in rows))
+        dir_offsets_at, dir_blob_at = _write_strings(
+            f, (name for category, subcategory, _, _ in directory for name in (category, subcategory)))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(rows), len(directory), directory_at, prices_at,
+                            sku_offsets_at, sku_blob_at, name_offsets_at, name_blob_at,
+                            dir_offsets_at, dir_blob_at))
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+class _StringColumn:
+    __slots__ = ("offsets", "blob")
+
+    def __init__(self, view, offsets_at, blob_at, count):
+        self.offsets = view[offsets_at:offsets_at + 4 * (count + 1)].cast("I")
+        self.blob = view[blob_at:]
+
+    def __getitem__(self, index):
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+
+class Catalog:
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise CatalogError("catalog files are little-endian; big-endian hosts are not supported")
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise CatalogError(f"{path}: empty catalog file")
+        self._view = view = memoryview(self._mmap)
+
+        try:
+            (magic, version, self.rows, subcategory_count, directory_at, prices_at, sku_offsets_at, sku_blob_at,
+             name_offsets_at, name_blob_at, dir_offsets_at, dir_blob_at) = self._header(view)
+        except CatalogError:
+            close_mapped([view], self._mmap, self._file)
+            raise
+
+        self.prices = view[prices_at:prices_at + 8 * self.rows].cast("d")
+        self.skus = _StringColumn(view, sku_offsets_at, sku_blob_at, self.rows)
+        self.names = _StringColumn(view, name_offsets_at, name_blob_at, self.rows)
+
+        # The directory is tiny (one entry per subcategory), so it is the only thing decoded up front
+        dir_names = _StringColumn(view, dir_offsets_at, dir_blob_at, 2 * subcategory_count)
+        self.index = {}
+        self._row_owner = []
+        for index in range(subcategory_count):
+            start, end, category_at, subcategory_at = DIRECTORY_ENTRY.unpack_from(
+                view, directory_at + index * DIRECTORY_ENTRY.size)
+            key = (dir_names[category_at], dir_names[subcategory_at])
+            self.index[key] = (start, end)
+            self._row_owner.append((start, key))
+
+    def _header(self, view):
+        # Header fields, after checking that every section they describe lies inside the
+        # file, so a truncated or corrupt file fails here instead of with a struct.error
+        size = len(view)
+        if size < HEADER.size:
+            raise CatalogError(f"{self.path}: truncated catalog file ({size} bytes, header alone is {HEADER.size})")
+        header = HEADER.unpack_from(view)
+        (magic, version, rows, subcategory_count, directory_at, prices_at, sku_offsets_at, sku_blob_at,
+         name_offsets_at, name_blob_at, dir_offsets_at, dir_blob_at) = header
+        if magic != MAGIC or version != VERSION:
+            raise CatalogError(f"{self.path}: not a version {VERSION} SKU catalog")
+
+        sections = [
+            ("directory", directory_at, DIRECTORY_ENTRY.size * subcategory_count),
+            ("prices", prices_at, 8 * rows),
+            ("sku offsets", sku_offsets_at, 4 * (rows + 1)),
+            ("name offsets", name_offsets_at, 4 * (rows + 1)),
+            ("directory name offsets", dir_offsets_at, 4 * (2 * subcategory_count + 1)),
+        ]
+        for name, at, length in sections:
+            if at + length > size:
+                raise CatalogError(f"{self.path}: truncated catalog file: {name} ends at byte {at + length}, "
+                                   f"file has {size}")
+        # Each blob ends where the last entry of its offsets column says
+        for name, offsets_at, blob_at, count in (("sku", sku_offsets_at, sku_blob_at, rows),
+                                                  ("name", name_offsets_at, name_blob_at, rows),
+                                                  ("directory name", dir_offsets_at, dir_blob_at,
+                                                   2 * subcategory_count)):
+            (blob_length,) = struct.unpack_from("<I", view, offsets_at + 4 * count)
+            if blob_at + blob_length > size:
+                raise CatalogError(f"{self.path}: truncated catalog file: {name} strings end at byte "
+                                   f"{blob_at + blob_length}, file has {size}")
+        return header
+
+    def close(self):
+        close_mapped([self.prices, self.skus.offsets, self.skus.blob, self.names.offsets, self.names.blob,
+                      self._view], self._mmap, self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    def subcategories(self, category=None):
+        return [key for key in self.index if category is None or key[0] == category]
+
+    def row_range(self, category, subcategory):
+        return self.index.get((category, subcategory), (0, 0))
+
+    def sku(self, row):
+        owner = bisect.bisect_right(self._row_owner, (row, (chr(0x10FFFF),))) - 1
+        category, subcategory = self._row_owner[owner][1]
+        return Sku(row, self.skus[row], self.names[row], category, subcategory, self.prices[row])
+
+    def price_range(self, category, subcategory, low, high):
+        # Rows of the subcategory priced within [low, high], cheapest first
+        start, end = self.row_range(category, subcategory)
+        first = bisect.bisect_left(self.prices, low, start, end)
+        last = bisect.bisect_right(self.prices, high, first, end)
+        return range(first, last)
+
+    def nearest_rows(self, category, subcategory, target_price, k=5):
+        # Two pointers walking outwards from the bisect position: O(log n + k)
+        start, end = self.row_range(category, subcategory)
+        prices = self.prices
+        right = bisect.bisect_left(prices, target_price, start, end)
+        left = right - 1
+        rows = []
+        while len(rows) < k and (left >= start or right < end):
+            if right >= end or (left >= start and target_price - prices[left] <= prices[right] - target_price):
+                rows.append(left)
+                left -= 1
+            else:
+                rows.append(right)
+                right += 1
+        return rows
+
+    def nearest(self, category, subcategory, target_price, k=5):
+        return [Sku(row, self.skus[row], self.names[row], category, subcategory, self.prices[row])
+                for row in self.nearest_rows(category, subcategory, target_price, k)]
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            yield record["sku"], record["name"], record["category"], record["subcategory"], float(record["price"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a memory-mapped SKU catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a catalog from a CSV (sku,name,category,subcategory,price)")
+    build.add_argument("csv")
+    build.add_argument("catalog")
+    nearest = commands.add_parser("nearest", help="list the SKUs nearest a target unit price")
+    nearest.add_argument("catalog")
+    nearest.add_argument("category")
+    nearest.add_argument("subcategory")
+    nearest.add_argument("price", type=float)
+    nearest.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(f"wrote {write_catalog(args.catalog, read_csv(args.csv))} SKUs to {args.catalog}")
+    else:
+        with Catalog(args.catalog) as catalog:
+            for sku in catalog.nearest(args.category, args.subcategory, args.price, args.k):
+                print(f"{sku.sku}\t{sku.price:.2f}\t{sku.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Category-Subcategory mapping
+CATEGORY_MAP = {
+    "BEER": [
+        "ALE",
+        "DRY STOUT",
+        "HARD SELTZER",
+        "VARIETY PACK",
+        "STOUT - IMPERIAL FLAVORED",
+        "CRAFT & SEASONAL BEER",
+        "BELGIAN BEERS",
+        "BOCK - DUNKLER BOCK",
+        "HARD & SPIKED",
+        "FLAVORED BEER",
+        "DOUBLE IPA",
+        "MALT LIQUOR",
+        "STOUT",
+        "ISA - SESSION IPA",
+        "STOUT - IMPERIAL",
+        "HARD SODA",
+        "IIPA - IMPERIAL / DOUBLE IPA",
+        "SMOKED - RAUCHBIER",
+        "SOUR / WILD BEER",
+        "FLAVORED - FRUIT",
+        "IIPA DIPA - IMPERIAL / DOUBLE IPA",
+        "RADLER / SHANDY",
+        "NON ALC",
+        "DUBBEL",
+        "IPA - WHITE",
+        "IPA - HAZY / NEIPA",
+        "BITTER - PREMIUM / STRONG / ESB",
+        "IPA",
+        "PORTER - FLAVORED",
+        "LAGER",
+        "IPA - ENGLISH",
+        "FLAVORED",
+        "STOUT - MILK / SWEET",
+        "BERLINER WEISSE - FLAVORED",
+        "IPA - FLAVORED",
+        "ISA",
+        "WEISSBIER - HEFEWEIZEN",
+        "SPECIALTY GRAIN - OTHER",
+        "SESSION IPA",
+        "BOCK - DOPPELBOCK",
+        "PILSNER",
+        "IMPERIAL IPA",
+        "TRIPEL",
+        "PILSENER - CZECH / SVETLÝ",
+        "CALIFORNIA COMMON / STEAM BEER",
+        "SAISON / FARMHOUSE / GRISETTE"
+    ],
+    "LIQUOR": [
+        "PISCO",
+        "IRISH WHISKEY",
+        "PREMADE COCKTAIL",
+        "MARGARITA READY-TO-DRINK",
+        "WHISKY",
+        "CACHACA",
+        "APERITIVO",
+        "FORTIFIED WINE",
+        "BITTERS",
+        "VODKA",
+        "GRAPPA",
+        "COGNAC",
+        "SHOCHU",
+        "MALT LIQUOR",
+        "LIQUOR",
+        "AMERICAN WHISKEY",
+        "WHISKEY",
+        "RUM",
+        "BOURBON",
+        "GRAIN ALCOHOL",
+        "APERITIF",
+        "BRANDY/COGNAC",
+        "JAPANESE WHISKY",
+        "WHISKEY - IRISH",
+        "CANADIAN WHISKY",
+        "GIN",
+        "LIQUEUR CORDIALS & SCHNAPPS",
+        "WHISKY - CANADIAN",
+        "WHISKY - JAPANESE",
+        "MIXER",
+        "VERMOUTH",
+        "MEZCAL",
+        "SOJU",
+        "SCOTCH",
+        "TEQUILA",
+        "PREPARED COCKTAIL",
+        "WHISKY - REST OF WORLD",
+        "BRANDY",
+        "WHISKEY - AMERICAN"
+    ],
+    "WINE": [
+        "FORTIFIED",
+        "CHAMPAGNE & SPARKLING WINE",
+        "FORTIFIED WINE",
+        "CHAMPAGNE",
+        "CHAMPAGNE & SPARKLING",
+        "ROSÉ WINE",
+        "RED WINE",
+        "SAKE",
+        "PORT WINE",
+        "SPARKLING SAKE",
+        "WINE MISCELLANEOUS",
+        "ROSE & BLUSH",
+        "SPARKLING WINE",
+        "NO & LOW WINE",
+        "WHITE WINE",
+        "DESSERT & FORTIFIED",
+        "PLUM WINE",
+        "ORANGE WINE",
+        "SAUV BLANC",
+        "ROSE WINE"
+    ]
+}
@@ -0,0 +1,205 @@
+"""Per-tenant planning configs loaded from JSON files.
+
+Each store keeps a directory of ``<tenant>.json`` files shaped like the module level
+``config`` in recommendation_engine. Tenants without their own file use
+``default.json`` when present, otherwise the built-in config.
+
+    store = ConfigStore("/etc/planner/tenants", max_tenants=5000)
+    engine = store.engine_for("store-0042")
+    engine.calculate_total_drinks(50, 20, {"BEER": ["IPA"]})
+
+Files are validated and compiled once into an immutable CompiledConfig. Every
+``check_interval`` seconds a lookup stats the file; when its mtime changed the new
+config is compiled and swapped in. Callers that already hold the previous engine
+keep using it undisturbed, and a file that fails validation is logged and ignored
+so the last good config stays active.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from .lru_cache import LRUCache
+from .recommendation_engine import PER_PERSON_KEYS, RecommendationEngine, compile_config, config
+
+logger = logging.getLogger("recommendation_engine.config")
+
+DEFAULT_TENANT = "default"
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _number(value, where, minimum=0.0, allow_minimum=True):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ConfigError(f"{where} must be a number, got {value!r}")
+    if value < minimum or (value == minimum and not allow_minimum):
+        raise ConfigError(f"{where} must be {'>=' if allow_minimum else '>'} {minimum}, got {value!r}")
+    return value
+
+
+def _mapping(value, where):
+    if not isinstance(value, dict):
+        raise ConfigError(f"{where} must be an object")
+    return value
+
+
+def validate_config(raw):
+    # Checks the structure compile_config relies on and returns raw unchanged
+    _mapping(raw, "config")
+    for key in ("budget_allocation", "head_allocation", "drink_per_type", "bottle_size"):
+        if key not in raw:
+            raise ConfigError(f"config is missing {key!r}")
+
+    drink_per_type = _mapping(raw["drink_per_type"], "drink_per_type")
+    if not drink_per_type:
+        raise ConfigError("drink_per_type must define at least one category")
+
+    for allocation_key in ("budget_allocation", "head_allocation"):
+        allocation = _mapping(raw[allocation_key], allocation_key)
+        for category in drink_per_type:
+            if category not in allocation:
+                raise ConfigError(f"{allocation_key} has no entry for {category!r}")
+        for category, percentage in allocation.items():
+            # A zero share would make single-category orders divide by zero
+            _number(percentage, f"{allocation_key}.{category}", allow_minimum=False)
+
+    for category, profiles in drink_per_type.items():
+        if category not in PER_PERSON_KEYS:
+            raise ConfigError(f"unknown category {category!r}, expected one of {sorted(PER_PERSON_KEYS)}")
+        per_person_key = PER_PERSON_KEYS[category]
+        for profile, data in _mapping(profiles, f"drink_per_type.{category}").items():
+            where = f"drink_per_type.{category}.{profile}"
+            _mapping(data, where)
+            for key in ("allocation", per_person_key) + (("drink_size",) if category == "LIQUOR" else ()):
+                if key not in data:
+                    raise ConfigError(f"{where} is missing {key!r}")
+                _number(data[key], f"{where}.{key}")
+            if data["allocation"] > 100:
+                raise ConfigError(f"{where}.allocation must be at most 100")
+
+    _number(raw["bottle_size"], "bottle_size", allow_minimum=False)
+    if "wine_glass_size" in raw:
+        _number(raw["wine_glass_size"], "wine_glass_size", allow_minimum=False)
+    return raw
+
+
+def load_config_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except ValueError as e:
+        raise ConfigError(f"{path}: invalid JSON: {e}")
+    try:
+        return compile_config(validate_config(raw))
+    except ConfigError as e:
+        raise ConfigError(f"{path}: {e}")
+
+
+class _TenantEntry:
+    __slots__ = ("engine", "path", "mtime_ns", "checked_at", "reloading", "rejected")
+
+    def __init__(self, engine, path, mtime_ns, checked_at):
+        self.engine = engine
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.checked_at = checked_at
+        self.reloading = False
+        # (path, mtime_ns) of the last file that failed to load, so it is not re-parsed every check
+        self.rejected = None
+
+
+class ConfigStore:
+    def __init__(self, directory, max_tenants=1024, check_interval=1.0, cache_size=0, metrics=None):
+        self.directory = directory
+        self.check_interval = check_interval
+        # Passed to every tenant's RecommendationEngine
+        self.cache_size = cache_size
+        self.metrics = metrics
+        self.entries = LRUCache(max_tenants)
+        self.reloads = 0
+        self.reload_errors = 0
+        self._lock = threading.Lock()
+        if metrics is not None:
+            # One gauge over the engines currently serving tenants; replaced engines drop out
+            metrics.add_gauge_source("tenant_cache", self.cache_stats)
+
+    def path_for(self, tenant):
+        if tenant and tenant != DEFAULT_TENANT:
+            if os.sep in tenant or (os.altsep and os.altsep in tenant) or tenant.startswith("."):
+                raise ConfigError(f"invalid tenant name {tenant!r}")
+            path = os.path.join(self.directory, f"{tenant}.json")
+            if os.path.exists(path):
+                return path
+        path = os.path.join(self.directory, f"{DEFAULT_TENANT}.json")
+        return path if os.path.exists(path) else None
+
+    def engine_for(self, tenant=None):
+        tenant = tenant or DEFAULT_TENANT
+        entry = self.entries.get(tenant)
+        if entry is None:
+            return self._load(tenant).engine
+
+        now = time.monotonic()
+        if now - entry.checked_at >= self.check_interval and not entry.reloading:
+            entry = self._maybe_reload(tenant, entry, now)
+        return entry.engine
+
+    def _load(self, tenant):
+        path = self.path_for(tenant)
+        mtime_ns = os.stat(path).st_mtime_ns if path else None
+        compiled = load_config_file(path) if path else compile_config(config)
+        entry = _TenantEntry(self._engine(compiled), path, mtime_ns, time.monotonic())
+        self.entries.put(tenant, entry)
+        return entry
+
+    def _maybe_reload(self, tenant, entry, now):
+        # Returns the entry callers should use: the new one after a reload, else the current one
+        with self._lock:
+            # Only one thread reloads a tenant; everybody else keeps the current engine
+            if entry.reloading:
+                return entry
+            entry.reloading = True
+        try:
+            entry.checked_at = now
+            try:
+                path = self.path_for(tenant)
+                mtime_ns = os.stat(path).st_mtime_ns if path else None
+                if (path, mtime_ns) in ((entry.path, entry.mtime_ns), entry.rejected):
+                    return entry
+                compiled = load_config_file(path) if path else compile_config(config)
+            except (ConfigError, OSError) as e:
+                entry.rejected = (path, mtime_ns)
+                self.reload_errors += 1
+                logger.error("keeping previous config for tenant %s: %s", tenant, e)
+                return entry
+            new_entry = _TenantEntry(self._engine(compiled), path, mtime_ns, now)
+            self.entries.put(tenant, new_entry)
+            self.reloads += 1
+            logger.info("reloaded config for tenant %s from %s", tenant, path or "built-in config")
+            return new_entry
+        finally:
+            entry.reloading = False
+
+    def _engine(self, compiled):
+        return RecommendationEngine(cache_size=self.cache_size, metrics=self.metrics, engine_config=compiled,
+                                    cache_gauge=None)
+
+    def cache_stats(self):
+        # LRU stats summed over the active tenant engines, None when caching is off
+        if not self.cache_size:
+            return None
+        totals = {"size": 0, "maxsize": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for entry in self.entries.values():
+            stats = entry.engine.cache_stats()
+            for key in totals:
+                totals[key] += stats[key]
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_ratio"] = totals["hits"] / lookups if lookups else 0.0
+        return totals
+
+    def stats(self):
+        return {"tenants": self.entries.stats(), "reloads": self.reloads, "reload_errors": self.reload_errors}
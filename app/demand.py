@@ -0,0 +1,181 @@
+"""Cross-event demand per subcategory and fulfilment date, checked against stock.
+
+A DemandLedger keeps one Fenwick tree over the days of its horizon for every
+(category, subcategory) that has demand. Adding, editing or cancelling an event costs
+O(k log days) for an event with k subcategories, and the demand of any date range is
+two prefix sums, O(log days):
+
+    ledger = DemandLedger(date(2026, 1, 1))
+    ledger.plan(engine, "wedding-17", date(2026, 3, 14), 120, 40, {"BEER": ["IPA", "LAGER"]})
+    ledger.demand("BEER", "IPA", date(2026, 3, 9), date(2026, 3, 16))    # end is exclusive
+    ledger.set_stock("BEER", "IPA", 500)
+    ledger.shortfalls(date(2026, 3, 9), date(2026, 3, 16))
+    ledger.first_shortfall("BEER", "IPA", date(2026, 3, 1))               # when stock runs out
+
+Units are the engine's units (bottles for LIQUOR and BEER, glasses for WINE), so stock
+has to be given in the same units.
+"""
+import datetime
+import threading
+from typing import NamedTuple
+
+
+class FenwickTree:
+    # Binary indexed tree over positions 0..size-1 with point updates and prefix sums
+    __slots__ = ("size", "tree")
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        index += 1
+        tree = self.tree
+        while index <= self.size:
+            tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, end):
+        # Sum of positions [0, end)
+        total = 0
+        tree = self.tree
+        while end > 0:
+            total += tree[end]
+            end -= end & -end
+        return total
+
+    def range_sum(self, start, end):
+        return self.prefix_sum(end) - self.prefix_sum(start)
+
+    def lower_bound(self, value):
+        # Smallest end with prefix_sum(end) >= value, or size + 1 when the total is below it.
+        # Needs non-negative entries, which unit demand always is.
+        if value <= 0:
+            return 0
+        position = 0
+        step = 1 << self.size.bit_length()
+        tree = self.tree
+        while step:
+            following = position + step
+            if following <= self.size and tree[following] < value:
+                position = following
+                value -= tree[following]
+            step >>= 1
+        return position + 1
+
+
+class Shortfall(NamedTuple):
+    category: str
+    subcategory: str
+    demand: int
+    stock: int
+    missing: int
+
+
+class _Event(NamedTuple):
+    day: int
+    units: dict
+
+
+class DemandLedger:
+    def __init__(self, start, days=732):
+        # Dates from start (inclusive) up to start + days (exclusive) can hold events
+        self.start = start
+        self.days = days
+        self.trees = {}
+        self.events = {}
+        self.stock = {}
+        self._lock = threading.Lock()
+
+    def _day(self, date):
+        day = (date - self.start).days
+        if not 0 <= day < self.days:
+            raise ValueError(f"{date} is outside the ledger horizon {self.start} .. "
+                             f"{self.start + datetime.timedelta(days=self.days - 1)}")
+        return day
+
+    def _clamp(self, date):
+        # Query bounds may reach past the horizon; there is no demand out there
+        return min(max((date - self.start).days, 0), self.days)
+
+    def _apply(self, day, units, sign):
+        for key, count in units.items():
+            tree = self.trees.get(key)
+            if tree is None:
+                tree = self.trees[key] = FenwickTree(self.days)
+            tree.add(day, sign * count)
+
+    @staticmethod
+    def units_of(result):
+        # (category, subcategory) -> units of one calculate_total_drinks result
+        units = {}
+        for item in result["data"]:
+            for subcategory, count in item["subcategories"].items():
+                key = (item["category"], subcategory)
+                units[key] = units.get(key, 0) + count
+        return units
+
+    def add_event(self, event_id, date, result):
+        # Adds or replaces (edits) an event; result is what calculate_total_drinks returned for it
+        day = self._day(date)
+        units = self.units_of(result)
+        with self._lock:
+            previous = self.events.get(event_id)
+            if previous is not None:
+                self._apply(previous.day, previous.units, -1)
+            self._apply(day, units, 1)
+            self.events[event_id] = _Event(day, units)
+
+    def cancel_event(self, event_id):
+        with self._lock:
+            event = self.events.pop(event_id, None)
+            if event is None:
+                raise KeyError(event_id)
+            self._apply(event.day, event.units, -1)
+
+    def plan(self, engine, event_id, date, number_of_attendees, per_person_budget, categories,
+             subcategory_weights=None):
+        result = engine.calculate_total_drinks(number_of_attendees, per_person_budget, categories,
+                                               subcategory_weights)
+        self.add_event(event_id, date, result)
+        return result
+
+    def demand(self, category, subcategory, start, end):
+        # Units needed for events dated in [start, end)
+        tree = self.trees.get((category, subcategory))
+        if tree is None:
+            return 0
+        return tree.range_sum(self._clamp(start), self._clamp(end))
+
+    def demand_by_subcategory(self, start, end, category=None):
+        first, last = self._clamp(start), self._clamp(end)
+        demand = {}
+        for key, tree in self.trees.items():
+            if category is None or key[0] == category:
+                units = tree.range_sum(first, last)
+                if units:
+                    demand[key] = units
+        return demand
+
+    def set_stock(self, category, subcategory, units):
+        self.stock[(category, subcategory)] = units
+
+    def shortfalls(self, start, end, category=None):
+        # Subcategories whose demand in [start, end) exceeds their stock, biggest gap first
+        short = [Shortfall(key[0], key[1], units, self.stock.get(key, 0), units - self.stock.get(key, 0))
+                 for key, units in self.demand_by_subcategory(start, end, category).items()
+                 if units > self.stock.get(key, 0)]
+        short.sort(key=lambda shortfall: shortfall.missing, reverse=True)
+        return short
+
+    def first_shortfall(self, category, subcategory, start):
+        # Date of the first event from `start` on that the current stock can no longer cover,
+        # or None. One O(log days) search down the tree.
+        tree = self.trees.get((category, subcategory))
+        if tree is None:
+            return None
+        first = self._clamp(start)
+        end = tree.lower_bound(tree.prefix_sum(first) + self.stock.get((category, subcategory), 0) + 1)
+        if end > self.days:
+            return None
+        return self.start + datetime.timedelta(days=end - 1)
@@ -0,0 +1,198 @@
+"""Optional metrics for RecommendationEngine.
+
+The engine only touches this module when it was given an Instrumentation instance,
+so a disabled engine pays a single ``is None`` check per stage.
+
+    metrics = Instrumentation([LoggingSink(), PrometheusFileSink("/var/lib/node_exporter/engine.prom")])
+    engine = RecommendationEngine(metrics=metrics)
+    ...
+    metrics.flush()             # push the aggregated snapshot to every sink
+    metrics.prometheus_text()   # or render it directly, e.g. for a /metrics endpoint
+"""
+import bisect
+import collections
+import logging
+import os
+import threading
+import time
+
+# Upper bounds (seconds) for stage timings and for input sizes
+TIME_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 100000)
+
+logger = logging.getLogger("recommendation_engine")
+
+
+class _Histogram:
+    __slots__ = ("bounds", "buckets", "count", "total")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow slot
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.total, "bounds": list(self.bounds), "buckets": list(self.buckets)}
+
+
+class Instrumentation:
+    def __init__(self, sinks=(), time_buckets=TIME_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.sinks = list(sinks)
+        self.time_buckets = tuple(time_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.timings = {}
+        self.sizes = {}
+        self.counters = collections.Counter()
+        self.gauge_sources = {}
+        self._lock = threading.Lock()
+
+    def timing(self, stage, seconds, category=None):
+        key = (stage, category)
+        with self._lock:
+            histogram = self.timings.get(key)
+            if histogram is None:
+                histogram = self.timings[key] = _Histogram(self.time_buckets)
+            histogram.observe(seconds)
+
+    def size(self, name, value):
+        with self._lock:
+            histogram = self.sizes.get(name)
+            if histogram is None:
+                histogram = self.sizes[name] = _Histogram(self.size_buckets)
+            histogram.observe(value)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def add_gauge_source(self, name, source):
+        # source() is called at snapshot time and returns a dict of numbers (or None)
+        self.gauge_sources[name] = source
+
+    def event(self, name, **fields):
+        for sink in self.sinks:
+            sink.event(name, fields)
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                "timestamp": time.time(),
+                "timings": {key: histogram.as_dict() for key, histogram in self.timings.items()},
+                "sizes": {name: histogram.as_dict() for name, histogram in self.sizes.items()},
+                "counters": dict(self.counters),
+            }
+        gauges = {}
+        for name, source in self.gauge_sources.items():
+            values = source()
+            if values:
+                gauges[name] = {k: v for k, v in values.items() if isinstance(v, (int, float))}
+        snapshot["gauges"] = gauges
+        return snapshot
+
+    def flush(self):
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.export(snapshot)
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.sizes.clear()
+            self.counters.clear()
+
+    def prometheus_text(self):
+        return prometheus_text(self.snapshot())
+
+
+class InMemorySink:
+    # Keeps the latest exported snapshot and the most recent events
+    def __init__(self, max_events=1000):
+        self.events = collections.deque(maxlen=max_events)
+        self.last_snapshot = None
+
+    def event(self, name, fields):
+        self.events.append((time.time(), name, fields))
+
+    def export(self, snapshot):
+        self.last_snapshot = snapshot
+
+
+class LoggingSink:
+    def __init__(self, log=logger, level=logging.INFO):
+        self.log = log
+        self.level = level
+
+    def event(self, name, fields):
+        self.log.log(self.level, "%s %s", name, " ".join(f"{k}={v}" for k, v in fields.items()))
+
+    def export(self, snapshot):
+        for (stage, category), timing in sorted(snapshot["timings"].items(), key=lambda item: str(item[0])):
+            mean_us = timing["sum"] / timing["count"] * 1e6 if timing["count"] else 0.0
+            self.log.log(self.level, "timing stage=%s category=%s count=%d mean_us=%.2f",
+                         stage, category or "-", timing["count"], mean_us)
+        for name, value in sorted(snapshot["counters"].items()):
+            self.log.log(self.level, "counter %s=%d", name, value)
+        for name, values in sorted(snapshot["gauges"].items()):
+            self.log.log(self.level, "gauge %s %s", name, " ".join(f"{k}={v}" for k, v in values.items()))
+
+
+class PrometheusFileSink:
+    # Writes the Prometheus text format to a file, e.g. for the node_exporter textfile collector
+    def __init__(self, path):
+        self.path = path
+
+    def event(self, name, fields):
+        pass
+
+    def export(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(prometheus_text(snapshot))
+        os.replace(tmp_path, self.path)
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items() if v is not None)
+
+
+def _histogram_lines(metric, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, bucket in zip(list(histogram["bounds"]) + ["+Inf"], histogram["buckets"]):
+        cumulative += bucket
+        lines.append(f'{metric}_bucket{{{_labels(**labels, le=bound)}}} {cumulative}')
+    label_text = _labels(**labels)
+    lines.append(f"{metric}_sum{{{label_text}}} {histogram['sum']}")
+    lines.append(f"{metric}_count{{{label_text}}} {histogram['count']}")
+    return lines
+
+
+def prometheus_text(snapshot):
+    lines = ["# HELP engine_stage_seconds Time spent per RecommendationEngine stage",
+             "# TYPE engine_stage_seconds histogram"]
+    for (stage, category), timing in snapshot["timings"].items():
+        lines.extend(_histogram_lines("engine_stage_seconds", {"stage": stage, "category": category}, timing))
+
+    lines += ["# HELP engine_input_size Distribution of input sizes",
+              "# TYPE engine_input_size histogram"]
+    for name, histogram in snapshot["sizes"].items():
+        lines.extend(_histogram_lines("engine_input_size", {"input": name}, histogram))
+
+    lines += ["# HELP engine_calls_total Engine call counters",
+              "# TYPE engine_calls_total counter"]
+    for name, value in snapshot["counters"].items():
+        lines.append(f'engine_calls_total{{{_labels(name=name)}}} {value}')
+
+    for name, values in snapshot["gauges"].items():
+        lines += [f"# TYPE engine_{name} gauge"]
+        for stat, value in values.items():
+            lines.append(f'engine_{name}{{{_labels(stat=stat)}}} {value}')
+    return "\n".join(lines) + "\n"
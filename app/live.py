@@ -0,0 +1,278 @@
+"""Live re-forecasting of a running event from point-of-sale consumption.
+
+A LiveForecast starts from a calculate_total_drinks plan and takes bar sales one at a
+time. Every sale is O(1): it updates the subcategory's sold units and an exponentially
+decayed consumption rate, re-projects that subcategory's demand up to the end of the
+event and its category's budget burn, and returns an Alert when a projection crosses
+its threshold:
+
+    forecast = LiveForecast.plan(engine, 200, 40, {"BEER": ["IPA", "LAGER"]}, start=time.time(), duration=5 * 3600)
+    alert = forecast.sale("BEER", "IPA", 2)                       # timestamp defaults to now
+    if alert:
+        ...                                                       # reorder, or watch the budget
+    forecast.restock("BEER", "IPA", 48)                           # delivered
+    forecast.forecast()                                           # every subcategory, O(subcategories)
+
+The rate estimate decays with half_life seconds and is bias corrected for the start
+of the event, so it means "units per second lately". prior_units of planned
+consumption are mixed in as pseudo-sales: they keep a handful of sales of a slow
+seller from swinging its rate and vanish against the volume of a fast one. Projected demand is
+sold + rate * time left; a reorder alert fires once the projected shortfall against
+the available stock (the planned units plus restocks) reaches reorder_threshold of
+the stock, and fires again only after a restock or once the projection is back within
+stock. Alerts project with the lower confidence bound of the rate (`confidence`
+standard deviations of the decayed sales, counted as Poisson), so a burst of sales of
+a slow seller does not page anyone while a real trend still does. Budget alerts work
+the same way on projected spend against the category budget.
+No alerts are raised during the first `warmup` seconds, when a few sales would
+swing the rate too much.
+"""
+import math
+import threading
+import time
+from typing import NamedTuple
+
+
+class Alert(NamedTuple):
+    kind: str               # "reorder" or "budget"
+    category: str
+    subcategory: str        # None for budget alerts
+    ts: float
+    projected: float        # units (reorder) or money (budget) by the end of the event
+    available: float        # stock or budget
+    shortfall: float
+    exhausted_at: float     # when stock / budget runs out at the current rate, None if it does not
+
+
+class Projection(NamedTuple):
+    category: str
+    subcategory: str
+    planned: int
+    stock: int
+    sold: int
+    rate_per_hour: float
+    projected: float
+    shortfall: float
+    exhausted_at: float
+
+
+class BudgetBurn(NamedTuple):
+    category: str
+    budget: float
+    spent: float
+    projected: float
+    overrun: float
+
+
+class _Rate:
+    # Exponentially decayed sum of amounts; rate() is amount per second lately, shrunk
+    # towards the planned rate by prior worth of planned consumption (in amount)
+    __slots__ = ("decayed", "last", "planned", "prior_seconds")
+
+    def __init__(self, start, planned, prior):
+        self.decayed = 0.0
+        self.last = start
+        self.planned = planned
+        # Seconds of planned consumption that add up to the prior
+        self.prior_seconds = prior / planned if planned > 0 else 0.0
+
+    def add(self, amount, ts, decay):
+        if ts > self.last:
+            self.decayed *= math.exp((self.last - ts) * decay)
+            self.last = ts
+        self.decayed += amount
+
+    def rate(self, ts, decay, elapsed, z=0.0, unit=1.0):
+        # z > 0 gives a lower confidence bound instead, treating the decayed amount as a
+        # Poisson count of `unit`s: z standard deviations below the estimate
+        decayed = self.decayed * math.exp((self.last - ts) * decay) if ts > self.last else self.decayed
+        # Bias correction: early on the window has not filled yet
+        window = (1 - math.exp(-elapsed * decay)) / decay if elapsed > 0 else 0.0
+        window += self.prior_seconds
+        if window <= 0:
+            return 0.0
+        count = decayed + self.planned * self.prior_seconds
+        if z and count > 0:
+            count = max(0.0, count - z * math.sqrt(count * unit))
+        return count / window
+
+
+class _Item:
+    __slots__ = ("category", "subcategory", "planned", "stock", "sold", "unit_cost", "rate", "alerted")
+
+    def __init__(self, category, subcategory, planned, unit_cost, start, duration, prior):
+        self.category = category
+        self.subcategory = subcategory
+        self.planned = planned
+        self.stock = planned
+        self.sold = 0
+        self.unit_cost = unit_cost
+        self.rate = _Rate(start, planned / duration, prior)
+        self.alerted = False
+
+
+class _Budget:
+    __slots__ = ("budget", "spent", "unit_cost", "rate", "alerted")
+
+    def __init__(self, budget, unit_cost, start, duration, prior):
+        self.budget = budget
+        self.spent = 0.0
+        self.unit_cost = unit_cost
+        self.rate = _Rate(start, budget / duration, prior * unit_cost)
+        self.alerted = False
+
+
+class LiveForecast:
+    def __init__(self, result, start, duration, budgets=None, half_life=900.0, prior_units=5.0,
+                 reorder_threshold=0.1, budget_threshold=0.1, confidence=2.0, warmup=300.0, on_alert=None):
+        # result is what calculate_total_drinks returned for the event; budgets maps a
+        # category to its budget (default: total_units * per_unit_cost). start / duration
+        # are in seconds, in the same clock as the sale timestamps.
+        self.start = start
+        self.end = start + duration
+        self.duration = duration
+        self.decay = math.log(2) / half_life
+        self.prior_units = prior_units
+        self.reorder_threshold = reorder_threshold
+        self.budget_threshold = budget_threshold
+        self.confidence = confidence
+        self.warmup = warmup
+        self.on_alert = on_alert
+        self.alerts = []
+        self.items = {}
+        self.budgets = {}
+        for item in result["data"]:
+            category = item["category"]
+            for subcategory, units in item["subcategories"].items():
+                self.items[(category, subcategory)] = _Item(category, subcategory, units, item["per_unit_cost"],
+                                                            start, duration, prior_units)
+            budget = (budgets or {}).get(category, item["total_units"] * item["per_unit_cost"])
+            self.budgets[category] = _Budget(budget, item["per_unit_cost"], start, duration,
+                                             prior_units)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def plan(cls, engine, number_of_attendees, per_person_budget, categories, start, duration,
+             subcategory_weights=None, **options):
+        result = engine.calculate_total_drinks(number_of_attendees, per_person_budget, categories, subcategory_weights)
+        budgets = engine.category_budgets(number_of_attendees, per_person_budget, categories)
+        return cls(result, start, duration, budgets, **options)
+
+    def _item(self, category, subcategory):
+        item = self.items.get((category, subcategory))
+        if item is None:
+            # Something off the plan is selling: no stock for it, so it alerts as soon as it may
+            budget = self.budgets.get(category)
+            if budget is None:
+                budget = self.budgets[category] = _Budget(0, 0, self.start, self.duration, self.prior_units)
+            unit_cost = next((other.unit_cost for other in self.items.values() if other.category == category), 0)
+            item = self.items[(category, subcategory)] = _Item(category, subcategory, 0, unit_cost, self.start,
+                                                               self.duration, self.prior_units)
+        return item
+
+    def _exhausted_at(self, ts, left, rate):
+        if left <= 0:
+            return ts
+        if rate <= 0:
+            return None
+        at = ts + left / rate
+        return at if at < self.end else None
+
+    def _emit(self, alert):
+        self.alerts.append(alert)
+        if self.on_alert is not None:
+            self.on_alert(alert)
+        return alert
+
+    def sale(self, category, subcategory, units=1, ts=None, price=None):
+        # Records units sold (negative for voids); price is per unit, default the plan's
+        # per_unit_cost. Returns the Alert this sale raised, if any.
+        if ts is None:
+            ts = time.time()
+        decay = self.decay
+        elapsed = ts - self.start
+        remaining = self.end - ts if ts < self.end else 0.0
+        with self._lock:
+            item = self._item(category, subcategory)
+            item.sold += units
+            item.rate.add(units, ts, decay)
+            budget = self.budgets[category]
+            spent = units * (item.unit_cost if price is None else price)
+            budget.spent += spent
+            budget.rate.add(spent, ts, decay)
+            if elapsed < self.warmup:
+                return None
+
+            alert = None
+            rate = item.rate.rate(ts, decay, elapsed, self.confidence)
+            projected = item.sold + rate * remaining
+            shortfall = projected - item.stock
+            if shortfall >= self.reorder_threshold * item.stock and shortfall > 0:
+                if not item.alerted:
+                    item.alerted = True
+                    alert = self._emit(Alert("reorder", category, subcategory, ts, projected, item.stock, shortfall,
+                                             self._exhausted_at(ts, item.stock - item.sold, rate)))
+            elif shortfall <= 0:
+                item.alerted = False
+
+            rate = budget.rate.rate(ts, decay, elapsed, self.confidence, budget.unit_cost or 1.0)
+            projected = budget.spent + rate * remaining
+            overrun = projected - budget.budget
+            if overrun >= self.budget_threshold * budget.budget and overrun > 0:
+                if not budget.alerted:
+                    budget.alerted = True
+                    budget_alert = self._emit(Alert("budget", category, None, ts, projected, budget.budget, overrun,
+                                                    self._exhausted_at(ts, budget.budget - budget.spent, rate)))
+                    alert = alert or budget_alert
+            elif overrun <= 0:
+                budget.alerted = False
+            return alert
+
+    def consume(self, sales):
+        # sale() over an iterable of (ts, category, subcategory, units) tuples; returns the alerts
+        raised = []
+        for ts, category, subcategory, units in sales:
+            alert = self.sale(category, subcategory, units, ts)
+            if alert is not None:
+                raised.append(alert)
+        return raised
+
+    def restock(self, category, subcategory, units):
+        with self._lock:
+            item = self._item(category, subcategory)
+            item.stock += units
+            item.alerted = False
+
+    def set_budget(self, category, budget):
+        with self._lock:
+            self.budgets[category].budget = budget
+            self.budgets[category].alerted = False
+
+    def forecast(self, ts=None):
+        # Projection of every subcategory at ts, biggest shortfall first
+        if ts is None:
+            ts = time.time()
+        elapsed = ts - self.start
+        remaining = self.end - ts if ts < self.end else 0.0
+        projections = []
+        with self._lock:
+            for item in self.items.values():
+                rate = item.rate.rate(ts, self.decay, elapsed)
+                projected = item.sold + rate * remaining
+                projections.append(Projection(item.category, item.subcategory, item.planned, item.stock, item.sold,
+                                              rate * 3600, projected, projected - item.stock,
+                                              self._exhausted_at(ts, item.stock - item.sold, rate)))
+        projections.sort(key=lambda projection: projection.shortfall, reverse=True)
+        return projections
+
+    def budget_burn(self, ts=None):
+        if ts is None:
+            ts = time.time()
+        elapsed = ts - self.start
+        remaining = self.end - ts if ts < self.end else 0.0
+        with self._lock:
+            burn = []
+            for category, budget in self.budgets.items():
+                projected = budget.spent + budget.rate.rate(ts, self.decay, elapsed) * remaining
+                burn.append(BudgetBurn(category, budget.budget, budget.spent, projected, projected - budget.budget))
+        return burn
@@ -0,0 +1,231 @@
+"""Incremental re-planning for interactive what-if edits.
+
+A Plan holds the inputs of one calculate_total_drinks call together with every
+intermediate value of it. Setting an input only records it; values are recomputed
+lazily when read, and each cached value remembers the inputs it was derived from,
+so only what actually depends on a changed input is recalculated:
+
+    allocations   <- category set
+    consumers     <- attendees, head percentage          (per category)
+    budget        <- attendees, per-person budget, budget percentage
+    units         <- consumers
+    per_unit_cost <- budget, units
+    distribution  <- units, subcategories, their weights
+
+With an answer table on the engine (see answer_table), in-domain units and
+per-unit costs are read from it instead (``answer`` <- category set, attendees,
+per-person budget).
+
+Nudging the attendee count therefore touches consumers and budgets but skips the
+subcategory split whenever the unit totals come out the same, toggling one beer
+style only re-splits BEER, and a budget change never recomputes units at all.
+
+    plan = Plan(engine, 50, 20, {"BEER": ["IPA", "Lager"], "WINE": ["Red"]})
+    plan.result()                       # same shape as calculate_total_drinks
+    plan.changes()                      # everything: nothing was sent yet
+    plan.toggle_subcategory("BEER", "Stout")
+    plan.changes()                      # {"changed": [<BEER delta>], "removed": [], "order": [...]}
+"""
+import collections
+
+
+def _item_delta(old, new):
+    # Fields of a result item that differ; subcategory counts are diffed per key,
+    # None marking a subcategory that no longer receives units. subcategory_order is
+    # sent when the subcategories are no longer listed in the same order.
+    delta = {key: value for key, value in new.items()
+             if key not in ("category", "subcategories") and old.get(key) != value}
+    old_subcategories = old.get("subcategories", {})
+    subcategories = {sub: units for sub, units in new["subcategories"].items() if old_subcategories.get(sub) != units}
+    subcategories.update((sub, None) for sub in old_subcategories if sub not in new["subcategories"])
+    if subcategories:
+        delta["subcategories"] = subcategories
+    if list(new["subcategories"]) != list(old_subcategories):
+        delta["subcategory_order"] = list(new["subcategories"])
+    return delta
+
+
+def diff_results(old, new):
+    # Delta between two calculate_total_drinks results, keyed by category. Categories that
+    # are new in `new` are sent whole; order lists the categories of `new` in order.
+    old_items = {item["category"]: item for item in old["data"]} if old else {}
+    changed = []
+    for item in new["data"]:
+        previous = old_items.get(item["category"])
+        if previous is None:
+            changed.append(dict(item, subcategories=dict(item["subcategories"])))
+            continue
+        delta = _item_delta(previous, item)
+        if delta:
+            changed.append(dict(delta, category=item["category"]))
+    new_categories = {item["category"] for item in new["data"]}
+    return {"changed": changed, "removed": [category for category in old_items if category not in new_categories],
+            "order": [item["category"] for item in new["data"]]}
+
+
+def apply_changes(results, changes):
+    # Client side of diff_results: returns the new results given the old ones and the delta,
+    # with categories, fields and subcategories in the same order as the new results
+    items = collections.OrderedDict((item["category"], dict(item, subcategories=dict(item["subcategories"])))
+                                    for item in (results["data"] if results else ()))
+    for category in changes["removed"]:
+        items.pop(category, None)
+    for delta in changes["changed"]:
+        item = items.setdefault(delta["category"], {"category": delta["category"], "subcategories": {}})
+        for key, value in delta.items():
+            if key == "subcategories":
+                for sub, units in value.items():
+                    if units is None:
+                        item["subcategories"].pop(sub, None)
+                    else:
+                        item["subcategories"][sub] = units
+            elif key == "subcategory_order":
+                continue
+            else:
+                item[key] = value
+        if "subcategory_order" in delta:
+            item["subcategories"] = {sub: item["subcategories"][sub] for sub in delta["subcategory_order"]}
+        # Result items list their subcategories last
+        item["subcategories"] = item.pop("subcategories")
+    order = changes.get("order", list(items))
+    return {"data": [items[category] for category in order]}
+
+
+class _Cached:
+    __slots__ = ("key", "value")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+class Plan:
+    def __init__(self, engine, number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+        self.engine = engine
+        self.number_of_attendees = int(number_of_attendees)
+        self.per_person_budget = float(per_person_budget)
+        self.categories = {category: list(subcategories) for category, subcategories in categories.items()}
+        self.subcategory_weights = dict(subcategory_weights) if subcategory_weights else None
+        # (field, category) -> _Cached; field is one of the names in the module docstring
+        self._cache = {}
+        # How often each field was actually recomputed, for tests and the UI
+        self.recomputed = collections.Counter()
+        self._sent = None
+
+    # Inputs. Setters only record the new value; nothing is computed until it is read.
+
+    def set_attendees(self, number_of_attendees):
+        self.number_of_attendees = int(number_of_attendees)
+
+    def set_budget(self, per_person_budget):
+        self.per_person_budget = float(per_person_budget)
+
+    def set_subcategories(self, category, subcategories):
+        # An empty list drops the category from the order
+        if subcategories:
+            self.categories[category] = list(subcategories)
+        else:
+            self.categories.pop(category, None)
+
+    def toggle_subcategory(self, category, subcategory):
+        subcategories = self.categories.get(category, [])
+        if subcategory in subcategories:
+            self.set_subcategories(category, [sub for sub in subcategories if sub != subcategory])
+        else:
+            self.set_subcategories(category, subcategories + [subcategory])
+
+    def set_categories(self, categories):
+        self.categories = {category: list(subcategories) for category, subcategories in categories.items()}
+
+    def set_weights(self, subcategory_weights):
+        self.subcategory_weights = dict(subcategory_weights) if subcategory_weights else None
+
+    def update(self, number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+        # Replace every input at once, e.g. from a submitted form
+        self.set_attendees(number_of_attendees)
+        self.set_budget(per_person_budget)
+        self.set_categories(categories)
+        self.set_weights(subcategory_weights)
+
+    # Intermediate values
+
+    def _get(self, field, category, key, compute):
+        cached = self._cache.get((field, category))
+        if cached is None or cached.key != key:
+            self.recomputed[field] += 1
+            cached = self._cache[(field, category)] = _Cached(key, compute())
+        return cached.value
+
+    def allocations(self):
+        return self._get("allocations", None, self.engine.allocation_set(self.categories), lambda: self.engine.allocations_for(self.categories))
+
+    def consumers(self, category):
+        head_percentage = self.allocations()[1][category]
+        return self._get("consumers", category, (self.number_of_attendees, head_percentage),
+                         lambda: self.engine.consumer_count(self.number_of_attendees, category,
+                                                            {category: head_percentage}))
+
+    def budget(self, category):
+        budget_percentage = self.allocations()[0][category]
+        return self._get("budget", category, (self.number_of_attendees, self.per_person_budget, budget_percentage),
+                         lambda: self.engine.category_budget(self.number_of_attendees, self.per_person_budget,
+                                                             category, {category: budget_percentage}))
+
+    def units(self, category):
+        consumers = self.consumers(category)
+        return self._get("units", category, consumers, lambda: self.engine.category_units(category, consumers))
+
+    def per_unit_cost(self, category):
+        budget = self.budget(category)
+        units = self.units(category)
+        return self._get("per_unit_cost", category, (budget, units), lambda: self.engine.unit_cost(budget, units))
+
+    def totals(self, category):
+        # (units, per_unit_cost), read from the engine's answer table when it covers the inputs
+        answers = self.engine.answer_table
+        if answers is not None and answers.covers(self.number_of_attendees, self.per_person_budget):
+            category_set = self.engine.allocation_set(self.categories)
+            answer = self._get("answer", category, (category_set, self.number_of_attendees, self.per_person_budget),
+                               lambda: answers.lookup(category_set, category, self.number_of_attendees,
+                                                      self.per_person_budget))
+            if answer is not None:
+                return answer
+        return self.units(category), self.per_unit_cost(category)
+
+    def distribution(self, category):
+        units = self.totals(category)[0]
+        subcategories = tuple(self.categories[category])
+        weights = self.subcategory_weights
+        # Only the weights of this category's subcategories matter for its split
+        weight_key = tuple(weights.get(sub, 1) for sub in subcategories) if weights else None
+        return self._get("distribution", category, (units, subcategories, weight_key),
+                         lambda: self.engine.distribute_units(subcategories, units, weights))
+
+    # Outputs
+
+    def planned_categories(self):
+        return [category for category, subcategories in self.categories.items()
+                if category in self.engine.compiled.coefficients and len(subcategories) > 0]
+
+    def result(self):
+        # Same shape and values as engine.calculate_total_drinks for the current inputs, except
+        # for unknown or empty categories: the engine repeats the previous category's item
+        # for those, the plan leaves them out
+        results = []
+        for category in self.planned_categories():
+            units, per_unit_cost = self.totals(category)
+            results.append({
+                "category": category,
+                "total_units": int(units),
+                "per_unit_cost": per_unit_cost,
+                "subcategories": dict(self.distribution(category))
+            })
+        return {"data": results}
+
+    def changes(self):
+        # Delta against the result returned by the previous changes() call (the whole
+        # result the first time), see diff_results / apply_changes
+        result = self.result()
+        changes = diff_results(self._sent, result)
+        self._sent = result
+        return changes
@@ -0,0 +1,272 @@
+"""Persistent plan store on SQLite (stdlib sqlite3 only).
+
+Every request is canonicalized before it is looked up: categories and subcategories
+sorted, the attendee count as an int, the budget as a float, weights reduced to the
+subcategories that are actually planned (whole-number weights as ints, like
+integer_weights treats them). The hash of the tenant, the engine's config
+fingerprint and that canonical request is the row key, so repeat requests are read
+from disk and a config change never serves a stale plan.
+
+    store = PlanStore("plans.db")
+    store.plan(engine, 50, 20, {"BEER": ["IPA", "LAGER"]}, tenant="store-0042")
+    store.query(tenant="store-0042", category="BEER", min_attendees=100, since=time.time() - 86400)
+
+    python -m app.plan_store query plans.db --tenant store-0042 --category BEER --since 2026-01-01
+
+Misses are planned with the canonical request. Subcategory order does not change
+category totals but does decide which subcategories get the leftover units, so only
+the stored totals are reused: every response re-splits them in the caller's order and
+equals what calculate_total_drinks returns for the caller's request. Misses of a batch
+are inserted in one transaction. The database runs in WAL mode and every thread gets
+its own connection, so any number of readers can work alongside the writer.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import numbers
+import sqlite3
+import sys
+import threading
+import time
+
+from .results import to_json
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    request_key TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    number_of_attendees INTEGER NOT NULL,
+    per_person_budget REAL NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plan_categories (
+    request_key TEXT NOT NULL REFERENCES plans (request_key) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    total_units INTEGER NOT NULL,
+    per_unit_cost INTEGER NOT NULL,
+    PRIMARY KEY (request_key, category)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plans_created ON plans (created_at);
+CREATE INDEX IF NOT EXISTS plans_tenant_created ON plans (tenant, created_at);
+CREATE INDEX IF NOT EXISTS plans_attendees ON plans (number_of_attendees);
+CREATE INDEX IF NOT EXISTS plan_categories_units ON plan_categories (category, total_units);
+"""
+
+DEFAULT_TENANT = "default"
+# SQLite's default limit on host parameters is 999 in older builds
+LOOKUP_CHUNK = 500
+
+
+def _canonical_weight(weight):
+    # recommendation_engine.integer_weights uses whole-number weights as they are and
+    # scales the others, so whole numbers become ints (5 and 5.0 plan alike) and the
+    # rest stay floats
+    if isinstance(weight, numbers.Integral) or float(weight).is_integer():
+        return int(weight)
+    return float(weight)
+
+
+def canonical_request(number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+    canonical_categories = sorted((category, sorted(subcategories)) for category, subcategories in categories.items())
+    weights = None
+    if subcategory_weights:
+        planned = {sub for _, subcategories in canonical_categories for sub in subcategories}
+        weights = sorted((sub, _canonical_weight(weight)) for sub, weight in subcategory_weights.items() if sub in planned)
+    return {
+        "number_of_attendees": int(number_of_attendees),
+        "per_person_budget": float(per_person_budget),
+        "categories": canonical_categories,
+        "subcategory_weights": weights or None
+    }
+
+
+def request_key(tenant, fingerprint, canonical):
+    text = json.dumps(canonical, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{tenant}\0{fingerprint.hex()}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _in_caller_order(engine, result, categories, subcategory_weights):
+    # A stored canonical result answered for the caller's request. Only the category totals
+    # are taken from it: the subcategory split is redone in the caller's subcategory order,
+    # which decides who gets the leftover units, and items are built the way
+    # calculate_total_drinks builds them (including its repeat of the previous item for
+    # unknown or empty categories).
+    totals = {item["category"]: item for item in result["data"]}
+    items = []
+    item = None
+    for category, subcategories in categories.items():
+        if category in engine.compiled.coefficients and len(subcategories) > 0:
+            stored = totals[category]
+            item = {
+                "category": category,
+                "total_units": stored["total_units"],
+                "per_unit_cost": stored["per_unit_cost"],
+                "subcategories": engine.distribute_units(subcategories, stored["total_units"], subcategory_weights)
+            }
+        if item:
+            items.append(dict(item, subcategories=dict(item["subcategories"])))
+    return {"data": items}
+
+
+class PlanStore:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+        connection = self._connection()
+        # WAL lets readers run while a writer commits; it is a property of the database file
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads, so each thread opens its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def plan(self, engine, number_of_attendees, per_person_budget, categories, subcategory_weights=None,
+             tenant=DEFAULT_TENANT):
+        return self.plan_many(engine, [(number_of_attendees, per_person_budget, categories, subcategory_weights)],
+                              tenant)[0]
+
+    def plan_many(self, engine, requests, tenant=DEFAULT_TENANT):
+        # requests: (number_of_attendees, per_person_budget, categories, subcategory_weights) tuples.
+        # One lookup query per LOOKUP_CHUNK requests, one transaction for all misses.
+        tenant = tenant or DEFAULT_TENANT
+        canonicals = [canonical_request(*request) for request in requests]
+        keys = [request_key(tenant, engine.compiled.fingerprint, canonical) for canonical in canonicals]
+        stored = self._fetch(set(keys))
+
+        rows = []
+        for key, canonical in zip(keys, canonicals):
+            if key in stored:
+                continue
+            result = engine.calculate_total_drinks(canonical["number_of_attendees"], canonical["per_person_budget"],
+                                                   dict(canonical["categories"]),
+                                                   dict(canonical["subcategory_weights"] or ()))
+            stored[key] = result
+            rows.append((key, canonical, result))
+        if rows:
+            self._insert(tenant, rows)
+        with self._counter_lock:
+            self.misses += len(rows)
+            self.hits += len(keys) - len(rows)
+        return [_in_caller_order(engine, stored[key], request[2], request[3]) for key, request in zip(keys, requests)]
+
+    def _fetch(self, keys):
+        connection = self._connection()
+        stored = {}
+        keys = list(keys)
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for key, result in connection.execute(
+                    f"SELECT request_key, result FROM plans WHERE request_key IN ({placeholders})", chunk):
+                stored[key] = json.loads(result)
+        return stored
+
+    def _insert(self, tenant, rows):
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # OR IGNORE: another process may have stored the same plan since the lookup
+            connection.executemany(
+                "INSERT OR IGNORE INTO plans (request_key, tenant, created_at, number_of_attendees, "
+                "per_person_budget, request, result) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, tenant, now, canonical["number_of_attendees"], canonical["per_person_budget"],
+                  json.dumps(canonical, separators=(",", ":"), ensure_ascii=False), to_json(result))
+                 for key, canonical, result in rows])
+            connection.executemany(
+                "INSERT OR IGNORE INTO plan_categories (request_key, category, total_units, per_unit_cost) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, item["category"], item["total_units"], item["per_unit_cost"])
+                 for key, _, result in rows for item in result["data"]])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def query(self, since=None, until=None, tenant=None, category=None, min_attendees=None, max_attendees=None,
+              min_units=None, max_units=None, limit=100):
+        # Past plans, newest first. since/until are unix timestamps; min/max_units filter
+        # the total_units of `category` and need it set.
+        if (min_units is not None or max_units is not None) and category is None:
+            raise ValueError("min_units/max_units filter a category's units and need category")
+        clauses = []
+        params = []
+        for column, operator, value in (("p.created_at", ">=", since), ("p.created_at", "<", until),
+                                        ("p.tenant", "=", tenant),
+                                        ("p.number_of_attendees", ">=", min_attendees),
+                                        ("p.number_of_attendees", "<=", max_attendees),
+                                        ("c.category", "=", category),
+                                        ("c.total_units", ">=", min_units), ("c.total_units", "<=", max_units)):
+            if value is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+        join = "JOIN plan_categories c ON c.request_key = p.request_key" if category is not None else ""
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT p.request_key, p.tenant, p.created_at, p.request, p.result FROM plans p {join} {where} "
+               f"ORDER BY p.created_at DESC LIMIT ?")
+        return [{
+            "request_key": key,
+            "tenant": tenant,
+            "created_at": created_at,
+            "request": json.loads(request),
+            "result": json.loads(result)
+        } for key, tenant, created_at, request, result in self._connection().execute(sql, params + [limit])]
+
+    def stats(self):
+        count, = self._connection().execute("SELECT COUNT(*) FROM plans").fetchone()
+        return {"plans": count, "hits": self.hits, "misses": self.misses}
+
+
+def _timestamp(text):
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the persistent plan store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="list past plans, newest first")
+    query.add_argument("database")
+    query.add_argument("--since", type=_timestamp, help="ISO date/time, inclusive")
+    query.add_argument("--until", type=_timestamp, help="ISO date/time, exclusive")
+    query.add_argument("--tenant")
+    query.add_argument("--category")
+    query.add_argument("--min-attendees", type=int)
+    query.add_argument("--max-attendees", type=int)
+    query.add_argument("--min-units", type=int, help="minimum total_units of --category")
+    query.add_argument("--max-units", type=int, help="maximum total_units of --category")
+    query.add_argument("--limit", type=int, default=100)
+    stats = commands.add_parser("stats", help="number of stored plans")
+    stats.add_argument("database")
+    args = parser.parse_args(argv)
+
+    store = PlanStore(args.database)
+    if args.command == "stats":
+        print(json.dumps(store.stats()))
+        return
+    for row in store.query(args.since, args.until, args.tenant, args.category, args.min_attendees,
+                           args.max_attendees, args.min_units, args.max_units, args.limit):
+        sys.stdout.write(json.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Turns category results into concrete product picks from a catalog.Catalog.
+
+For every subcategory of a category result we pick at most one SKU and buy the
+subcategory's units of it. Plans are ranked lexicographically: first by how many
+subcategories are covered, then by how close each pick is to the target unit price,
+and the total must stay within the category budget calculate_*_quantity derives.
+
+Two bounded-time stages:
+  1. greedy: nearest-price pick everywhere, then the cheapest downgrades (least
+     closeness lost per dollar saved) until the plan fits; drops a subcategory
+     only when nothing cheaper is left. Always returns a feasible plan; past the
+     deadline it stops downgrading and takes the cheapest candidates instead.
+  2. multiple-choice knapsack DP over the budget discretized into `resolution`
+     buckets, vectorized with NumPy. Costs are rounded up to whole buckets, so the
+     result always fits the real budget and is optimal for any plan that leaves at
+     least one bucket of slack per subcategory.
+The DP checks the clock before every candidate it adds; when `time_budget_ms` runs
+out before the last subcategory is done, the greedy plan (the best plan found so far)
+is returned with exact=False.
+
+Wine is planned in glasses but sold by the bottle; units_per_sku() converts with the
+engine config's bottle_size and wine_glass_size. benchmarks/bench_product_optimizer.py
+times optimize_plan and checks the DP against brute force.
+"""
+import math
+import time
+
+import numpy as np
+
+NEAREST_CANDIDATES = 5
+
+
+def units_per_sku(compiled, category):
+    # Engine units per catalog SKU: wine is planned in glasses but sold by the bottle,
+    # liquor and beer are planned in bottles already
+    return compiled.glasses_per_bottle if category == "WINE" else 1
+
+
+def _candidates(catalog, category, subcategory, target_price):
+    rows = catalog.nearest_rows(category, subcategory, target_price, NEAREST_CANDIDATES)
+    start, end = catalog.row_range(category, subcategory)
+    if end > start and start not in rows:
+        # The cheapest SKU keeps the subcategory coverable under tight budgets
+        rows.append(start)
+    return rows
+
+
+def _closeness(price, target_price):
+    if target_price <= 0:
+        return 0.0
+    return min(1.0, abs(price - target_price) / target_price)
+
+
+class _Group:
+    __slots__ = ("subcategory", "quantity", "rows", "costs", "distances")
+
+    def __init__(self, subcategory, quantity, rows, prices, target_price):
+        self.subcategory = subcategory
+        self.quantity = quantity
+        self.rows = rows
+        self.costs = [quantity * price for price in prices]
+        self.distances = [_closeness(price, target_price) for price in prices]
+
+
+def _score(groups, choice):
+    covered = sum(1 for pick in choice if pick is not None)
+    distance = sum(groups[g].distances[pick] for g, pick in enumerate(choice) if pick is not None)
+    return covered, -distance
+
+
+def _drop_until_fits(groups, choice, spent, budget):
+    # Drops the most expensive picks until the plan fits
+    while spent > budget:
+        g = max((g for g, pick in enumerate(choice) if pick is not None),
+                key=lambda g: groups[g].costs[choice[g]])
+        spent -= groups[g].costs[choice[g]]
+        choice[g] = None
+    return choice
+
+
+def _greedy(groups, budget, deadline=math.inf):
+    # Start from the closest candidate of every subcategory
+    choice = [min(range(len(group.rows)), key=group.distances.__getitem__) if group.rows else None
+              for group in groups]
+    spent = sum(groups[g].costs[pick] for g, pick in enumerate(choice) if pick is not None)
+
+    while spent > budget:
+        if time.perf_counter() > deadline:
+            # Out of time for careful downgrades: cheapest candidate everywhere
+            choice = [min(range(len(group.rows)), key=group.costs.__getitem__) if pick is not None else None
+                      for group, pick in zip(groups, choice)]
+            spent = sum(groups[g].costs[pick] for g, pick in enumerate(choice) if pick is not None)
+            return _drop_until_fits(groups, choice, spent, budget)
+        best = None
+        for g, pick in enumerate(choice):
+            if pick is None:
+                continue
+            group = groups[g]
+            for candidate, cost in enumerate(group.costs):
+                saved = group.costs[pick] - cost
+                if saved <= 0:
+                    continue
+                ratio = (group.distances[candidate] - group.distances[pick]) / saved
+                if best is None or ratio < best[0]:
+                    best = (ratio, g, candidate, saved)
+        if best is not None:
+            _, g, candidate, saved = best
+            choice[g] = candidate
+            spent -= saved
+        else:
+            # Nothing can be downgraded any more: drop the most expensive pick
+            return _drop_until_fits(groups, choice, spent, budget)
+    return choice
+
+
+def _knapsack(groups, budget, resolution, deadline):
+    # Returns the optimal choice for the discretized problem, or None when out of time
+    if budget <= 0:
+        return [None] * len(groups)
+    bucket = budget / resolution
+    # Lexicographic value: one more covered subcategory beats any closeness improvement
+    coverage = 1.0
+    closeness_scale = 1.0 / (len(groups) + 1)
+
+    best = np.zeros(resolution + 1)
+    choices = []
+    for group in groups:
+        new_best = best.copy()
+        choice = np.full(resolution + 1, -1, dtype=np.int16)
+        for index, cost in enumerate(group.costs):
+            if time.perf_counter() > deadline:
+                return None
+            weight = math.ceil(cost / bucket - 1e-9)
+            if weight > resolution:
+                continue
+            value = coverage + (1.0 - group.distances[index]) * closeness_scale
+            candidate = np.full(resolution + 1, -np.inf)
+            candidate[weight:] = best[:resolution + 1 - weight] + value
+            better = candidate > new_best
+            new_best[better] = candidate[better]
+            choice[better] = index
+        best = new_best
+        choices.append((choice, group))
+
+    result = []
+    capacity = resolution
+    for choice, group in reversed(choices):
+        index = int(choice[capacity])
+        if index < 0:
+            result.append(None)
+        else:
+            result.append(index)
+            capacity -= math.ceil(group.costs[index] / bucket - 1e-9)
+    result.reverse()
+    return result
+
+
+def optimize_category(catalog, category_result, budget, time_budget_ms=2.0, resolution=512, sku_units=1):
+    # sku_units: engine units one catalog SKU covers, see units_per_sku()
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000
+    category = category_result["category"]
+    target_price = category_result["per_unit_cost"] * sku_units
+
+    groups = []
+    for subcategory, units in category_result["subcategories"].items():
+        quantity = math.ceil(units / sku_units)
+        if quantity <= 0:
+            continue
+        rows = _candidates(catalog, category, subcategory, target_price)
+        groups.append(_Group(subcategory, quantity, rows, [catalog.prices[row] for row in rows], target_price))
+
+    choice = _greedy(groups, budget, deadline)
+    exact = False
+    if time.perf_counter() < deadline:
+        optimal = _knapsack(groups, budget, resolution, deadline)
+        if optimal is not None:
+            exact = True
+            if _score(groups, optimal) >= _score(groups, choice):
+                choice = optimal
+
+    picks = []
+    uncovered = []
+    spent = 0.0
+    for group, pick in zip(groups, choice):
+        if pick is None:
+            uncovered.append(group.subcategory)
+            continue
+        sku = catalog.sku(group.rows[pick])
+        cost = group.costs[pick]
+        spent += cost
+        picks.append({
+            "subcategory": group.subcategory,
+            "sku": sku.sku,
+            "name": sku.name,
+            "unit_price": sku.price,
+            "quantity": group.quantity,
+            "cost": round(cost, 2)
+        })
+    # Subcategories that received no units at all are uncovered too
+    planned = {group.subcategory for group in groups}
+    uncovered.extend(sub for sub in category_result["subcategories"] if sub not in planned)
+
+    return {
+        "category": category,
+        "budget": budget,
+        "spent": round(spent, 2),
+        "target_unit_price": target_price,
+        "covered": len(picks),
+        "picks": picks,
+        "uncovered": uncovered,
+        "exact": exact,
+        "elapsed_ms": (time.perf_counter() - started) * 1000
+    }
+
+
+def optimize_plan(engine, catalog, number_of_attendees, per_person_budget, categories, time_budget_ms=5.0):
+    # Plans the event with the engine, then picks products for every category result,
+    # sharing time_budget_ms between the categories
+    started = time.perf_counter()
+    results = engine.calculate_total_drinks(number_of_attendees, per_person_budget, categories)
+    budgets = engine.category_budgets(number_of_attendees, per_person_budget, categories)
+
+    plans = []
+    remaining = len(results["data"])
+    for item in results["data"]:
+        left_ms = time_budget_ms - (time.perf_counter() - started) * 1000
+        plans.append(optimize_category(catalog, item, budgets[item["category"]],
+                                       time_budget_ms=max(0.0, left_ms / remaining),
+                                       sku_units=units_per_sku(engine.compiled, item["category"])))
+        remaining -= 1
+    return {"data": results["data"], "products": plans}
@@ -1,7 +1,16 @@
+import hashlib
+import itertools
 import json
 import math
 import os
-from typing import Dict, List
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+# numpy is only needed by the batch / sweep paths and is imported inside them, so
+# importing the engine pulls in nothing outside the standard library
+
+from .lru_cache import LRUCache
+from .results import PlanResult, encode_binary, to_json
 
 config = {
     "budget_allocation": {
@@ -31,40 +40,334 @@ config = {
             "LIGHT": {"allocation": 0, "bottles_per_person": 4}
         }
     },
-    "bottle_size": 0.75
+    "bottle_size": 0.75,
+    # Millilitres per wine glass; only used to convert planned glasses to bottles
+    "wine_glass_size": 150
+}
+
+# Per-person quantity key of each drinker profile in config["drink_per_type"]
+PER_PERSON_KEYS = {
+    "LIQUOR": "drinks_per_person",
+    "WINE": "glasses_per_person",
+    "BEER": "bottles_per_person"
 }
 
 
+class CompiledConfig(NamedTuple):
+    bottle_size: float
+    # category -> ((per_person_quantity, allocation_fraction), ...) for profiles with allocation > 0.
+    # per_person_quantity is litres for LIQUOR, glasses for WINE and bottles for BEER.
+    coefficients: Mapping[str, Tuple[Tuple[float, float], ...]]
+    # frozenset of ordered categories -> (budget percentages, head percentages), already
+    # redistributed to 100% the same way recalculate_allocation_percentages does it
+    allocations: Mapping[frozenset, Tuple[Mapping[str, float], Mapping[str, float]]]
+    allocation_categories: frozenset
+    # Original percentages, used by the batch path to renormalize per event
+    budget_allocation: Mapping[str, float]
+    head_allocation: Mapping[str, float]
+    # SHA-256 of everything above that affects results; equal configs share it
+    fingerprint: bytes
+    # Wine glasses per bottle, for turning planned glasses into bottles to buy. It does
+    # not change calculate_total_drinks results, so it is not part of the fingerprint.
+    glasses_per_bottle: float = 5.0
+
+
+def compile_config(engine_config) -> CompiledConfig:
+    coefficients = {}
+    for category, profiles in engine_config["drink_per_type"].items():
+        per_person_key = PER_PERSON_KEYS[category]
+        terms = []
+        for data in profiles.values():
+            if data["allocation"] > 0:
+                if category == "LIQUOR":
+                    per_person = data[per_person_key] * data["drink_size"] / 1000
+                else:
+                    per_person = data[per_person_key]
+                terms.append((per_person, data["allocation"] / 100))
+        coefficients[category] = tuple(terms)
+
+    # There are only a handful of category sets, so normalize every one of them up front
+    allocation_categories = frozenset(engine_config["budget_allocation"]) | frozenset(engine_config["head_allocation"])
+    allocations = {}
+    for size in range(len(allocation_categories) + 1):
+        for category_set in itertools.combinations(sorted(allocation_categories), size):
+            allocations[frozenset(category_set)] = (
+                MappingProxyType(RecommendationEngine.recalculate_allocation_percentages(
+                    category_set, engine_config["budget_allocation"])),
+                MappingProxyType(RecommendationEngine.recalculate_allocation_percentages(
+                    category_set, engine_config["head_allocation"]))
+            )
+
+    canonical = json.dumps({
+        "bottle_size": engine_config["bottle_size"],
+        "coefficients": {cat: [list(term) for term in terms] for cat, terms in coefficients.items()},
+        "budget_allocation": dict(engine_config["budget_allocation"]),
+        "head_allocation": dict(engine_config["head_allocation"]),
+    }, sort_keys=True)
+
+    return CompiledConfig(
+        bottle_size=engine_config["bottle_size"],
+        coefficients=MappingProxyType(coefficients),
+        allocations=MappingProxyType(allocations),
+        allocation_categories=allocation_categories,
+        budget_allocation=MappingProxyType(dict(engine_config["budget_allocation"])),
+        head_allocation=MappingProxyType(dict(engine_config["head_allocation"])),
+        fingerprint=hashlib.sha256(canonical.encode("utf-8")).digest(),
+        glasses_per_bottle=engine_config["bottle_size"] * 1000 / engine_config.get("wine_glass_size", 150)
+    )
+
+
+# Float popularity weights are scaled to integers so apportionment is exact
+WEIGHT_SCALE = 1 << 20
+
+
+def integer_weights(weights):
+    if any(w < 0 for w in weights):
+        raise ValueError("subcategory weights must not be negative")
+    # Whole-number weights (ints, or floats like 5.0) are used as they are, so 5 and 5.0
+    # apportion the same way
+    if all(isinstance(w, int) or float(w).is_integer() for w in weights):
+        return [int(w) for w in weights]
+    largest = max(weights, default=0)
+    if largest <= 0:
+        return [0] * len(weights)
+    # Positive weights never round down to zero
+    return [max(1, round(w / largest * WEIGHT_SCALE)) if w > 0 else 0 for w in weights]
+
+
+def apportion(total_units, weights):
+    # Largest-remainder apportionment: every entry gets floor(total * w / W), the leftover
+    # units go to the largest remainders (earlier entries win ties, as in apportion_batch).
+    # Integer arithmetic, so the counts always sum to total_units. All-zero weights split
+    # evenly; negative weights are rejected.
+    weights = integer_weights(weights)
+    weight_total = sum(weights)
+    if weight_total <= 0:
+        weights = [1] * len(weights)
+        weight_total = len(weights)
+
+    counts = []
+    remainders = []
+    for weight in weights:
+        count, remainder = divmod(total_units * weight, weight_total)
+        counts.append(count)
+        remainders.append(remainder)
+
+    leftover = total_units - sum(counts)
+    if leftover:
+        # Remainders above the leftover-th largest get a unit, then equal ones lowest index first
+        threshold = _nth_largest(remainders, leftover)
+        ties = leftover - sum(remainder > threshold for remainder in remainders)
+        for index, remainder in enumerate(remainders):
+            if remainder > threshold:
+                counts[index] += 1
+            elif remainder == threshold and ties:
+                counts[index] += 1
+                ties -= 1
+    return counts
+
+
+def _nth_largest(values, n):
+    # Quickselect: expected linear time, where ranking by sorting is O(k log k)
+    while True:
+        pivot = values[len(values) // 2]
+        above = [value for value in values if value > pivot]
+        if n <= len(above):
+            values = above
+            continue
+        n -= len(above) + values.count(pivot)
+        if n <= 0:
+            return pivot
+        values = [value for value in values if value < pivot]
+
+
+def apportion_batch(total_units, weights, out=None):
+    # Vectorized apportion for many events at once. total_units has shape (events,) and
+    # weights shape (subcategories,) or (events, subcategories); a zero weight leaves a
+    # subcategory out of that event. Returns int64 counts of shape (events, subcategories)
+    # where each row sums exactly to its total (rows whose weights are all zero stay zero).
+    import numpy as np
+
+    totals = np.asarray(total_units).astype(np.int64)
+    weights = np.asarray(weights)
+    if np.any(weights < 0):
+        raise ValueError("subcategory weights must not be negative")
+    if not np.issubdtype(weights.dtype, np.integer):
+        # Like integer_weights, row by row: whole-number rows are used as they are
+        whole = np.all(weights == np.trunc(weights), axis=-1, keepdims=True)
+        largest = weights.max(axis=-1, keepdims=True)
+        scaled = np.rint(np.divide(weights, largest, out=np.zeros(weights.shape), where=largest > 0) * WEIGHT_SCALE)
+        weights = np.where(whole, weights, np.where(weights > 0, np.maximum(scaled, 1), 0))
+    weights = np.broadcast_to(weights.astype(np.int64), (totals.shape[0], weights.shape[-1]))
+
+    weight_total = weights.sum(axis=1)
+    has_weight = weight_total > 0
+    safe_total = np.where(has_weight, weight_total, 1)[:, None]
+    numerators = totals[:, None] * weights
+    counts = np.floor_divide(numerators, safe_total, out=out)
+    remainders = numerators - counts * safe_total
+
+    leftover = np.where(has_weight, totals - counts.sum(axis=1), 0)
+    # The leftover-th largest remainder of every row, by selection rather than sorting: one
+    # partition per distinct leftover count. Rows without leftover keep a threshold above
+    # every remainder.
+    threshold = np.full(totals.shape[0], np.iinfo(np.int64).max)
+    for units in np.flatnonzero(np.bincount(leftover)[1:]) + 1:
+        rows = np.flatnonzero(leftover == units)
+        threshold[rows] = -np.partition(-remainders[rows], units - 1, axis=1)[:, units - 1]
+    greater = remainders > threshold[:, None]
+    # Equal remainders at the threshold go to the lowest index first, as in apportion
+    tied = remainders == threshold[:, None]
+    ties = leftover - greater.sum(axis=1)
+    counts += greater | (tied & (np.cumsum(tied, axis=1) <= ties[:, None]))
+    return counts
+
 
 class RecommendationEngine:
-    def __init__(self):
-        print("started")
-        self.bottle_size = config["bottle_size"]
+    def __init__(self, cache_size: int = 0, metrics=None, engine_config=None, answer_table=None, cache_gauge="cache"):
+        # engine_config is a config dict shaped like the module level config or an already
+        # compiled CompiledConfig (see config_store); the module config is the default
+        if engine_config is None:
+            engine_config = config
+        self.compiled = engine_config if isinstance(engine_config, CompiledConfig) else compile_config(engine_config)
+        self.bottle_size = self.compiled.bottle_size
+        # Optional LRU of calculate_total_drinks results, disabled when cache_size is 0
+        self.cache = LRUCache(cache_size) if cache_size else None
+        # Optional instrumentation.Instrumentation; every hook below is skipped when it is None
+        self.metrics = metrics
+        # Optional answer_table.AnswerTable with precomputed category totals for the UI domain
+        if answer_table is not None and not answer_table.matches(self.compiled):
+            raise ValueError(f"{answer_table.path} was built for a different config")
+        self.answer_table = answer_table
+        if metrics is not None:
+            # Engines sharing metrics must not share a gauge name; None registers no cache
+            # gauge (config_store reports all of its tenants' caches as one)
+            if cache_gauge is not None:
+                metrics.add_gauge_source(cache_gauge, self.cache_stats)
+            metrics.event("engine_started", cache_size=cache_size)
 
     def calculate_total_drinks(self, number_of_attendees: int, per_person_budget: float,
-                               categories: Dict[str, List[str]]):
-        new_budget_allocation = self.recalculate_allocation_percentages(categories,
-                                                                        config["budget_allocation"])
-        new_head_allocation = self.recalculate_allocation_percentages(categories,
-                                                                      config["head_allocation"])
+                               categories: Dict[str, List[str]], subcategory_weights: Dict[str, float] = None):
+        # subcategory_weights optionally maps subcategory -> popularity weight (default 1)
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+            metrics.count("calculate_total_drinks")
+            metrics.size("attendees", int(number_of_attendees))
+
+        answers = self.answer_table
+        if answers is not None and answers.covers(number_of_attendees, per_person_budget):
+            results = self._lookup_total_drinks(number_of_attendees, per_person_budget, categories,
+                                                subcategory_weights)
+            # Checked before the LRU: table hits are cheap enough that they neither go
+            # through nor into it, so they do not show up as cache misses
+            if results is not None:
+                if metrics is not None:
+                    metrics.count("answer_table_hits")
+                    metrics.timing("total", time.perf_counter() - started)
+                return {"data": results}
+
+        if self.cache is not None:
+            key = self.cache_key(number_of_attendees, per_person_budget, categories, subcategory_weights)
+            cached = self.cache.get(key)
+            if cached is not None:
+                if metrics is not None:
+                    metrics.timing("total", time.perf_counter() - started)
+                return self._copy_results(cached)
+
+        if metrics is not None:
+            stage_started = time.perf_counter()
+        new_budget_allocation, new_head_allocation = self.allocations_for(categories)
+        if metrics is not None:
+            metrics.timing("allocation_percentages", time.perf_counter() - stage_started)
+
         results: [] = []
         result: {} = {}
         for category, subcategories in categories.items():
-            if category in config["drink_per_type"] and len(subcategories) > 0:
+            if category in self.compiled.coefficients and len(subcategories) > 0:
+                if metrics is not None:
+                    stage_started = time.perf_counter()
+                    metrics.size("subcategories", len(subcategories))
                 if category == "LIQUOR":
                     result = self.calculate_spirit_quantity(number_of_attendees, per_person_budget, category,
-                                                            subcategories, new_budget_allocation, new_head_allocation)
+                                                            subcategories, new_budget_allocation, new_head_allocation,
+                                                            subcategory_weights)
                 elif category == "WINE":
                     result = self.calculate_wine_quantity(number_of_attendees, per_person_budget, category,
-                                                          subcategories, new_budget_allocation, new_head_allocation)
+                                                          subcategories, new_budget_allocation, new_head_allocation,
+                                                          subcategory_weights)
                 elif category == "BEER":
                     result = self.calculate_beer_quantity(number_of_attendees, per_person_budget, category,
-                                                       subcategories, new_budget_allocation, new_head_allocation)
+                                                       subcategories, new_budget_allocation, new_head_allocation,
+                                                       subcategory_weights)
+                if metrics is not None:
+                    # Includes the allocate_subcategories call, which is also timed on its own
+                    metrics.timing("quantity", time.perf_counter() - stage_started, category)
             if result:
                 results.append(result)
+
+        if self.cache is not None:
+            self.cache.put(key, {"data": results})
+            results = self._copy_results({"data": results})["data"]
+        if metrics is not None:
+            metrics.timing("total", time.perf_counter() - started)
         return {"data": results}
 
-    def recalculate_allocation_percentages(self, categories, allocation_config):
+    def _lookup_total_drinks(self, number_of_attendees, per_person_budget, categories, subcategory_weights):
+        # calculate_total_drinks with the category totals read from the answer table;
+        # None when the table has no entry for the category set
+        category_set = self.allocation_set(categories)
+        results = []
+        result = {}
+        for category, subcategories in categories.items():
+            if category in self.compiled.coefficients and len(subcategories) > 0:
+                answer = self.answer_table.lookup(category_set, category, number_of_attendees, per_person_budget)
+                if answer is None:
+                    return None
+                result = self.allocate_subcategories(category, subcategories, answer[0], answer[1],
+                                                     subcategory_weights)
+            if result:
+                results.append(result)
+        return results
+
+    def allocation_set(self, categories):
+        return frozenset(cat for cat in categories if cat in self.compiled.allocation_categories)
+
+    def allocations_for(self, categories):
+        # Precomputed (budget, head) percentages for the categories in the user's order
+        return self.compiled.allocations[self.allocation_set(categories)]
+
+    def category_budgets(self, number_of_attendees, per_person_budget, categories):
+        # The per-category budget calculate_*_quantity derives, which the results only expose
+        # indirectly through per_unit_cost
+        new_budget_allocation, _ = self.allocations_for(categories)
+        return {
+            category: self.category_budget(number_of_attendees, per_person_budget, category, new_budget_allocation)
+            for category, subcategories in categories.items()
+            if category in self.compiled.coefficients and len(subcategories) > 0
+        }
+
+    @staticmethod
+    def cache_key(number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+        # Category and subcategory order is kept: it decides result order and which
+        # subcategories win remainder ties in allocate_subcategories
+        return (
+            int(number_of_attendees),
+            float(per_person_budget),
+            tuple((category, tuple(subcategories)) for category, subcategories in categories.items()),
+            tuple(sorted(subcategory_weights.items())) if subcategory_weights else None
+        )
+
+    @staticmethod
+    def _copy_results(results):
+        # Cached results are shared, so hand callers their own dicts
+        return {"data": [dict(item, subcategories=dict(item["subcategories"])) for item in results["data"]]}
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    @staticmethod
+    def recalculate_allocation_percentages(categories, allocation_config):
         # Filter to only include categories that are in user's order
         available_categories = [cat for cat in allocation_config.keys() if cat in categories]
 
@@ -85,77 +388,82 @@ class RecommendationEngine:
 
         return new_percentages
 
-    def calculate_spirit_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation):
-        if new_budget_allocation[category] is not None:
-            no_of_consumers = math.ceil(int(number_of_attendees) * (float(new_head_allocation[category] / 100)))
-            budget_allocation = math.ceil(
-                int(number_of_attendees) * float(per_person_budget) * (
-                    float(new_budget_allocation[category] / 100)))
-            total_litres_consumable = 0
-
-            for data in config["drink_per_type"][category].values():
-                if data["allocation"] > 0:
-                    total_litres_consumable += (data["drinks_per_person"] * data[
-                        "drink_size"] / 1000) * no_of_consumers * (
-                                                       data["allocation"] / 100)
-
-            bottles_needed = max(1, math.ceil(total_litres_consumable / self.bottle_size))
-            per_bottle_cost = math.ceil(budget_allocation / bottles_needed)
-
-        return self.allocate_subcategories(category, subcategories, bottles_needed, per_bottle_cost)
-
-    def calculate_wine_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation):
-        if new_budget_allocation[category] is not None:
-            no_of_consumers = math.ceil(int(number_of_attendees) * (float(new_head_allocation[category] / 100)))
-            budget_allocation = math.ceil(
-                int(number_of_attendees) * float(per_person_budget) * (
-                    float(new_budget_allocation[category] / 100)))
-            total_glasses_consumable = 0
-
-            for data in config["drink_per_type"][category].values():
-                if data["allocation"] > 0:
-                    total_glasses_consumable += data["glasses_per_person"] * no_of_consumers * (
-                                data["allocation"] / 100)
-
-            per_glass_cost = math.ceil(
-                budget_allocation / total_glasses_consumable) if total_glasses_consumable > 0 else 0
-
-        return self.allocate_subcategories(category, subcategories, total_glasses_consumable, per_glass_cost)
-
-    def calculate_beer_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation):
-        if new_budget_allocation[category] is not None:
-            no_of_consumers = math.ceil(int(number_of_attendees) * (float(new_head_allocation[category] / 100)))
-            budget_allocation = math.ceil(
-                int(number_of_attendees) * float(per_person_budget) * (
-                    float(new_budget_allocation[category] / 100)))
-            total_bottles_consumable = 0
-
-            for data in config["drink_per_type"][category].values():
-                if data["allocation"] > 0:
-                    total_bottles_consumable += math.ceil(
-                        data["bottles_per_person"] * no_of_consumers * (data["allocation"] / 100))
-
-            per_bottle_cost = math.ceil(
-                budget_allocation / total_bottles_consumable) if total_bottles_consumable > 0 else 0
-
-        return self.allocate_subcategories(category, subcategories, total_bottles_consumable, per_bottle_cost)
-
-    def allocate_subcategories(self, category: dict, subcategories: dict, total_units: int, per_unit_cost: float):
-        subcategory_distribution = {}
-        subcategory_count = len(subcategories)
-        unit_per_subcategory = max(1, math.ceil(total_units / subcategory_count))
-        remaining_units = total_units
-
-        for subcategory in subcategories:
-            if remaining_units == 0:
-                break
-            elif remaining_units == 1:
-                subcategory_distribution[subcategory] = 1
-                remaining_units -= 1
-            else:
-                subcategory_distribution[subcategory] = min(unit_per_subcategory, remaining_units)
-                remaining_units -= unit_per_subcategory
+    def calculate_spirit_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation, subcategory_weights=None):
+        no_of_consumers = self.consumer_count(number_of_attendees, category, new_head_allocation)
+        budget_allocation = self.category_budget(number_of_attendees, per_person_budget, category,
+                                                 new_budget_allocation)
+        bottles_needed = self.spirit_units(category, no_of_consumers)
+        per_bottle_cost = self.unit_cost(budget_allocation, bottles_needed)
+
+        return self.allocate_subcategories(category, subcategories, bottles_needed, per_bottle_cost, subcategory_weights)
+
+    def calculate_wine_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation, subcategory_weights=None):
+        no_of_consumers = self.consumer_count(number_of_attendees, category, new_head_allocation)
+        budget_allocation = self.category_budget(number_of_attendees, per_person_budget, category,
+                                                 new_budget_allocation)
+        total_glasses_consumable = self.wine_units(category, no_of_consumers)
+        per_glass_cost = self.unit_cost(budget_allocation, total_glasses_consumable)
+
+        return self.allocate_subcategories(category, subcategories, total_glasses_consumable, per_glass_cost, subcategory_weights)
 
+    def calculate_beer_quantity(self, number_of_attendees, per_person_budget, category, subcategories, new_budget_allocation, new_head_allocation, subcategory_weights=None):
+        no_of_consumers = self.consumer_count(number_of_attendees, category, new_head_allocation)
+        budget_allocation = self.category_budget(number_of_attendees, per_person_budget, category,
+                                                 new_budget_allocation)
+        total_bottles_consumable = self.beer_units(category, no_of_consumers)
+        per_bottle_cost = self.unit_cost(budget_allocation, total_bottles_consumable)
+
+        return self.allocate_subcategories(category, subcategories, total_bottles_consumable, per_bottle_cost, subcategory_weights)
+
+    # The calculate_*_quantity steps on their own, for callers that cache intermediate values (plan.Plan)
+    @staticmethod
+    def consumer_count(number_of_attendees, category, new_head_allocation):
+        return math.ceil(int(number_of_attendees) * (float(new_head_allocation[category] / 100)))
+
+    @staticmethod
+    def category_budget(number_of_attendees, per_person_budget, category, new_budget_allocation):
+        return math.ceil(int(number_of_attendees) * float(per_person_budget) * (
+            float(new_budget_allocation[category] / 100)))
+
+    def spirit_units(self, category, no_of_consumers):
+        total_litres_consumable = 0
+        for litres_per_person, allocation in self.compiled.coefficients[category]:
+            total_litres_consumable += litres_per_person * no_of_consumers * allocation
+        return max(1, math.ceil(total_litres_consumable / self.bottle_size))
+
+    def wine_units(self, category, no_of_consumers):
+        total_glasses_consumable = 0
+        for glasses_per_person, allocation in self.compiled.coefficients[category]:
+            total_glasses_consumable += glasses_per_person * no_of_consumers * allocation
+        return total_glasses_consumable
+
+    def beer_units(self, category, no_of_consumers):
+        total_bottles_consumable = 0
+        for bottles_per_person, allocation in self.compiled.coefficients[category]:
+            total_bottles_consumable += math.ceil(bottles_per_person * no_of_consumers * allocation)
+        return total_bottles_consumable
+
+    def category_units(self, category, no_of_consumers):
+        if category == "LIQUOR":
+            return self.spirit_units(category, no_of_consumers)
+        if category == "WINE":
+            return self.wine_units(category, no_of_consumers)
+        return self.beer_units(category, no_of_consumers)
+
+    @staticmethod
+    def unit_cost(budget_allocation, total_units):
+        return math.ceil(budget_allocation / total_units) if total_units > 0 else 0
+
+    def allocate_subcategories(self, category: dict, subcategories: dict, total_units: int, per_unit_cost: float,
+                               subcategory_weights: Dict[str, float] = None):
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+
+        subcategory_distribution = self.distribute_units(subcategories, total_units, subcategory_weights)
+
+        if metrics is not None:
+            metrics.timing("allocate_subcategories", time.perf_counter() - started, category)
         return {
             "category": category,
             "total_units": int(total_units),
@@ -163,9 +471,218 @@ class RecommendationEngine:
             "subcategories": subcategory_distribution
         }
 
-    def recommend_products(self, number_of_attendees, per_person_budget, user_input_categories):
+    @staticmethod
+    def distribute_units(subcategories, total_units, subcategory_weights=None):
+        # Wine passes a float glass count; the distribution adds up to the reported int(total_units)
+        units = int(total_units)
+        subcategory_distribution = {}
+        if subcategory_weights:
+            counts = apportion(units, [subcategory_weights.get(subcategory, 1) for subcategory in subcategories])
+            for subcategory, count in zip(subcategories, counts):
+                if count > 0:
+                    subcategory_distribution[subcategory] = subcategory_distribution.get(subcategory, 0) + count
+        else:
+            # Equal weights: every subcategory gets the quotient, the first `extra` one more
+            base, extra = divmod(units, len(subcategories))
+            for index, subcategory in enumerate(subcategories):
+                count = base + 1 if index < extra else base
+                if count > 0:
+                    subcategory_distribution[subcategory] = subcategory_distribution.get(subcategory, 0) + count
+
+        return subcategory_distribution
+
+    def calculate_total_drinks_batch(self, number_of_attendees, per_person_budget, categories, out=None,
+                                     subcategory_weights=None):
+        # Columnar version of calculate_total_drinks for many events at once.
+        # number_of_attendees / per_person_budget are 1-d arrays (one entry per event) and
+        # categories maps a category name to a boolean array telling whether the event
+        # ordered it. Values match the scalar path for events with non-empty subcategory lists.
+        # With out=batch_buffers.BatchBuffers(...) everything is computed into those buffers,
+        # including subcategory counts (subcategory_weights), and out is returned.
+        import numpy as np
+
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+
+        if out is not None:
+            from .batch_buffers import fill_batch
+
+            fill_batch(self, out, number_of_attendees, per_person_budget, categories, subcategory_weights)
+            if metrics is not None:
+                metrics.count("calculate_total_drinks_batch")
+                metrics.count("batch_events", out.size)
+                metrics.size("batch_events", out.size)
+                metrics.timing("batch_total", time.perf_counter() - started)
+            return out
+
+        attendees = np.asarray(number_of_attendees, dtype=np.int64)
+        budgets = np.asarray(per_person_budget, dtype=np.float64)
+        selected = {
+            cat: np.broadcast_to(np.asarray(categories.get(cat, False), dtype=bool), attendees.shape)
+            for cat in self.compiled.coefficients
+        }
+
+        new_budget_allocation = self.recalculate_allocation_fractions_batch(selected, self.compiled.budget_allocation)
+        new_head_allocation = self.recalculate_allocation_fractions_batch(selected, self.compiled.head_allocation)
+
+        attendees_f = attendees.astype(np.float64)
+        results = {}
+        for category, mask in selected.items():
+            no_of_consumers = np.ceil(attendees_f * new_head_allocation[category])
+            budget_allocation = np.ceil(attendees_f * budgets * new_budget_allocation[category])
+
+            units = self._units_batch(category, no_of_consumers)
+            per_unit_cost = self._unit_cost_batch(budget_allocation, units)
+            # total_units is reported as int(total_units) on the scalar path (wine glasses are fractional)
+            total_units = np.trunc(units)
+
+            results[category] = {
+                "selected": mask,
+                "consumers": np.where(mask, no_of_consumers, 0).astype(np.int64),
+                "budget": np.where(mask, budget_allocation, 0).astype(np.int64),
+                "total_units": np.where(mask, total_units, 0).astype(np.int64),
+                "per_unit_cost": np.where(mask, per_unit_cost, 0).astype(np.int64),
+            }
+
+        if metrics is not None:
+            metrics.count("calculate_total_drinks_batch")
+            metrics.count("batch_events", attendees.size)
+            metrics.size("batch_events", attendees.size)
+            metrics.timing("batch_total", time.perf_counter() - started)
+        return {"data": results}
+
+    def recalculate_allocation_fractions_batch(self, selected, allocation_config):
+        # Same redistribution as recalculate_allocation_percentages, returned as fractions
+        # (percentage / 100) per event so they can be multiplied in directly
+        import numpy as np
+
+        percentages = {
+            cat: np.where(selected[cat], allocation_config[cat], 0).astype(np.float64)
+            for cat in allocation_config if cat in selected
+        }
+        total_available_percentage = sum(percentages.values())
+        has_total = total_available_percentage > 0
+
+        fractions = {}
+        for cat, percentage in percentages.items():
+            new_percentage = np.divide(percentage, total_available_percentage,
+                                       out=np.zeros_like(percentage), where=has_total) * 100
+            fractions[cat] = new_percentage / 100
+        return fractions
+
+    def sweep(self, attendees, budgets, categories):
+        # Sensitivity grid: total_units and per_unit_cost for every (attendees, budget) pair of
+        # one category selection, as dense (len(attendees), len(budgets)) int64 arrays per
+        # category. attendees / budgets are ranges or 1-d array-likes; categories is a
+        # calculate_total_drinks categories dict or just the category names. Every cell
+        # equals the calculate_total_drinks value for that pair. total_units only varies by row
+        # and is a read-only broadcast of one column.
+        _, grid = next(self.iter_sweep(attendees, budgets, categories, max_cells=None))
+        return grid
+
+    def iter_sweep(self, attendees, budgets, categories, max_cells=1 << 22):
+        # Streams the sweep grid in blocks of whole attendee rows holding at most max_cells
+        # cells per array (None: one block). Yields (row slice, block) where block has the
+        # same shape as sweep()'s result restricted to those rows.
+        import numpy as np
+
+        metrics = self.metrics
+        attendees = np.asarray(attendees, dtype=np.int64)
+        budgets = np.asarray(budgets, dtype=np.float64)
+        if attendees.ndim != 1 or budgets.ndim != 1:
+            raise ValueError("attendees and budgets must be 1-d")
+
+        if isinstance(categories, Mapping):
+            planned = [cat for cat, subcategories in categories.items()
+                       if cat in self.compiled.coefficients and len(subcategories) > 0]
+        else:
+            planned = [cat for cat in categories if cat in self.compiled.coefficients]
+        new_budget_allocation, new_head_allocation = self.allocations_for(categories)
+        # Same float factors the scalar path multiplies with
+        budget_fractions = {cat: float(new_budget_allocation[cat] / 100) for cat in planned}
+        head_fractions = {cat: float(new_head_allocation[cat] / 100) for cat in planned}
+
+        rows_per_block = len(attendees) if not max_cells else max(1, max_cells // max(1, len(budgets)))
+        for first in range(0, max(len(attendees), 1), max(rows_per_block, 1)):
+            if metrics is not None:
+                started = time.perf_counter()
+            rows = slice(first, first + rows_per_block)
+            attendees_f = attendees[rows].astype(np.float64)
+            # Units only depend on the attendee count, so they are computed per row, not per cell
+            spend = (attendees_f[:, None] * budgets[None, :])
+            data = {}
+            for category in planned:
+                no_of_consumers = np.ceil(attendees_f * head_fractions[category])
+                units = self._units_batch(category, no_of_consumers)
+                budget_allocation = np.ceil(spend * budget_fractions[category])
+                per_unit_cost = self._unit_cost_batch(budget_allocation, units[:, None])
+                data[category] = {
+                    "total_units": np.broadcast_to(np.trunc(units).astype(np.int64)[:, None], spend.shape),
+                    "per_unit_cost": per_unit_cost.astype(np.int64),
+                }
+            if metrics is not None:
+                metrics.count("sweep_cells", spend.size)
+                metrics.timing("sweep_block", time.perf_counter() - started)
+            yield rows, {"attendees": attendees[rows], "budgets": budgets, "data": data}
+
+    def _units_batch(self, category, no_of_consumers):
+        if category == "LIQUOR":
+            return self._spirit_units_batch(category, no_of_consumers)
+        if category == "WINE":
+            return self._wine_units_batch(category, no_of_consumers)
+        return self._beer_units_batch(category, no_of_consumers)
+
+    def _spirit_units_batch(self, category, no_of_consumers):
+        import numpy as np
+
+        total_litres_consumable = np.zeros_like(no_of_consumers)
+        for litres_per_person, allocation in self.compiled.coefficients[category]:
+            total_litres_consumable += litres_per_person * no_of_consumers * allocation
+        return np.maximum(1, np.ceil(total_litres_consumable / self.bottle_size))
+
+    def _wine_units_batch(self, category, no_of_consumers):
+        import numpy as np
+
+        total_glasses_consumable = np.zeros_like(no_of_consumers)
+        for glasses_per_person, allocation in self.compiled.coefficients[category]:
+            total_glasses_consumable += glasses_per_person * no_of_consumers * allocation
+        return total_glasses_consumable
+
+    def _beer_units_batch(self, category, no_of_consumers):
+        import numpy as np
+
+        total_bottles_consumable = np.zeros_like(no_of_consumers)
+        for bottles_per_person, allocation in self.compiled.coefficients[category]:
+            total_bottles_consumable += np.ceil(bottles_per_person * no_of_consumers * allocation)
+        return total_bottles_consumable
+
+    @staticmethod
+    def _unit_cost_batch(budget_allocation, total_units):
+        # Broadcasts, so a (rows, 1) unit column divides a (rows, columns) budget grid
+        import numpy as np
+
+        has_units = total_units > 0
+        budget_allocation, total_units, has_units = np.broadcast_arrays(budget_allocation, total_units, has_units)
+        return np.ceil(np.divide(budget_allocation, total_units, out=np.zeros(budget_allocation.shape),
+                                 where=has_units))
+
+    def calculate_plan(self, number_of_attendees, per_person_budget, categories, subcategory_weights=None):
+        # calculate_total_drinks as a results.PlanResult
+        return PlanResult.from_dict(self.calculate_total_drinks(number_of_attendees, per_person_budget, categories,
+                                                                subcategory_weights))
+
+    def recommend_products(self, number_of_attendees, per_person_budget, user_input_categories, encoding="pretty"):
+        # encoding: "pretty" (indented JSON, the original output), "json" (compact JSON)
+        # or "binary" (results.encode_binary bytes)
         results = self.calculate_total_drinks(number_of_attendees, per_person_budget, user_input_categories)
-        return json.dumps(results, indent=4)
+        if encoding == "pretty":
+            return json.dumps(results, indent=4)
+        if encoding == "json":
+            return to_json(results)
+        if encoding == "binary":
+            return encode_binary(results)
+        raise ValueError(f"unknown encoding {encoding!r}")
 
 # if __name__ == '__main__':
 #     engine = RecommendationEngineTest()
@@ -0,0 +1,247 @@
+"""Typed calculate_total_drinks results and compact encodings for them.
+
+PlanResult / CategoryResult are NamedTuples mirroring the dict shape
+({"data": [{"category", "total_units", "per_unit_cost", "subcategories"}]}), which
+stays available through as_dict() / from_dict().
+
+Encodings:
+    to_json         compact JSON of the dict shape (no indentation or spaces)
+    encode_binary   one plan as a fixed-layout struct record, see below; records can be
+                    concatenated and read back with iter_binary
+    write_columnar  many plans as typed columns in one buffer; ColumnarPlans reads them
+                    back as zero-copy memoryviews (np.frombuffer works on every column)
+
+Binary plan record (little-endian):
+    PLAN        item count, subcategory count
+    ITEM        category code, subcategory count, total_units, per_unit_cost   per item
+    SUBCATEGORY units, name length                                             per subcategory
+    names       utf-8 subcategory names, back to back
+
+Columnar layout (little-endian, sections 8-byte aligned):
+    header          magic, version, plan/item/subcategory/name counts, section offsets
+    plan_offsets    uint32[plans + 1]      first item of each plan
+    categories      uint8[items]           CATEGORY_CODES index
+    total_units     int64[items]
+    per_unit_cost   int64[items]
+    sub_offsets     uint32[items + 1]      first subcategory of each item
+    sub_units       int64[subcategories]
+    sub_names       uint32[subcategories]  index into the name table
+    name_offsets    uint32[names + 1] + utf-8 blob of the distinct subcategory names
+"""
+import io
+import json
+import struct
+from array import array
+from typing import Dict, NamedTuple, Tuple
+
+from .binary_files import align, release_views
+
+# Same order as recommendation_engine.PER_PERSON_KEYS; codes are part of both encodings
+CATEGORY_CODES = ("LIQUOR", "WINE", "BEER")
+_CATEGORY_INDEX = {category: code for code, category in enumerate(CATEGORY_CODES)}
+
+PLAN = struct.Struct("<HH")
+ITEM = struct.Struct("<BxHqq")
+SUBCATEGORY = struct.Struct("<qH")
+
+COLUMNAR_MAGIC = b"PLNCOL01"
+COLUMNAR_VERSION = 1
+# magic, version, plans, items, subcategories, names, then offsets of: plan_offsets,
+# categories, total_units, per_unit_cost, sub_offsets, sub_units, sub_names,
+# name_offsets, name blob
+COLUMNAR_HEADER = struct.Struct("<8sIIIII9Q")
+
+
+class CategoryResult(NamedTuple):
+    category: str
+    total_units: int
+    per_unit_cost: int
+    subcategories: Dict[str, int]
+
+    def as_dict(self):
+        return {
+            "category": self.category,
+            "total_units": self.total_units,
+            "per_unit_cost": self.per_unit_cost,
+            "subcategories": dict(self.subcategories)
+        }
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(item["category"], item["total_units"], item["per_unit_cost"], dict(item["subcategories"]))
+
+
+class PlanResult(NamedTuple):
+    data: Tuple[CategoryResult, ...]
+
+    def as_dict(self):
+        return {"data": [item.as_dict() for item in self.data]}
+
+    @classmethod
+    def from_dict(cls, results):
+        return cls(tuple(CategoryResult.from_dict(item) for item in results["data"]))
+
+
+def _as_plan(plan):
+    return plan if isinstance(plan, PlanResult) else PlanResult.from_dict(plan)
+
+
+def _category_code(category):
+    try:
+        return _CATEGORY_INDEX[category]
+    except KeyError:
+        raise ValueError(f"category {category!r} has no binary code") from None
+
+
+def to_json(plan):
+    # Compact JSON of the dict shape, for a PlanResult or a calculate_total_drinks dict
+    if isinstance(plan, PlanResult):
+        plan = plan.as_dict()
+    return json.dumps(plan, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_binary(plan):
+    plan = _as_plan(plan)
+    parts = [PLAN.pack(len(plan.data), sum(len(item.subcategories) for item in plan.data))]
+    names = []
+    for item in plan.data:
+        parts.append(ITEM.pack(_category_code(item.category), len(item.subcategories),
+                               item.total_units, item.per_unit_cost))
+    for item in plan.data:
+        for name, units in item.subcategories.items():
+            encoded = name.encode("utf-8")
+            parts.append(SUBCATEGORY.pack(units, len(encoded)))
+            names.append(encoded)
+    return b"".join(parts + names)
+
+
+def decode_binary(buffer, offset=0):
+    # Returns (PlanResult, offset just past the record)
+    item_count, subcategory_count = PLAN.unpack_from(buffer, offset)
+    offset += PLAN.size
+    items = []
+    for _ in range(item_count):
+        items.append(ITEM.unpack_from(buffer, offset))
+        offset += ITEM.size
+    subcategories = []
+    for _ in range(subcategory_count):
+        subcategories.append(SUBCATEGORY.unpack_from(buffer, offset))
+        offset += SUBCATEGORY.size
+
+    view = memoryview(buffer)
+    data = []
+    position = 0
+    for code, count, total_units, per_unit_cost in items:
+        distribution = {}
+        for units, length in subcategories[position:position + count]:
+            distribution[str(view[offset:offset + length], "utf-8")] = units
+            offset += length
+        position += count
+        data.append(CategoryResult(CATEGORY_CODES[code], total_units, per_unit_cost, distribution))
+    return PlanResult(tuple(data)), offset
+
+
+def iter_binary(buffer):
+    # Reads back concatenated encode_binary records
+    offset = 0
+    while offset < len(buffer):
+        plan, offset = decode_binary(buffer, offset)
+        yield plan
+
+
+def write_columnar(f, plans):
+    # Writes plans (PlanResults or calculate_total_drinks dicts) to a binary file object;
+    # returns the number of plans
+    plan_offsets = array("I", [0])
+    categories = array("B")
+    total_units = array("q")
+    per_unit_cost = array("q")
+    sub_offsets = array("I", [0])
+    sub_units = array("q")
+    sub_names = array("I")
+    name_ids = {}
+    for plan in plans:
+        for item in _as_plan(plan).data:
+            categories.append(_category_code(item.category))
+            total_units.append(item.total_units)
+            per_unit_cost.append(item.per_unit_cost)
+            for name, units in item.subcategories.items():
+                sub_units.append(units)
+                sub_names.append(name_ids.setdefault(name, len(name_ids)))
+            sub_offsets.append(len(sub_units))
+        plan_offsets.append(len(categories))
+
+    encoded_names = [name.encode("utf-8") for name in name_ids]
+    name_offsets = array("I", [0])
+    for encoded in encoded_names:
+        name_offsets.append(name_offsets[-1] + len(encoded))
+
+    start = f.tell()
+    f.write(b"\0" * COLUMNAR_HEADER.size)
+    offsets = []
+    for column in (plan_offsets, categories, total_units, per_unit_cost, sub_offsets, sub_units, sub_names,
+                   name_offsets):
+        offsets.append(align(f) - start)
+        f.write(column)
+    offsets.append(align(f) - start)
+    f.write(b"".join(encoded_names))
+    end = f.tell()
+
+    f.seek(start)
+    f.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, len(plan_offsets) - 1, len(categories),
+                                 len(sub_units), len(name_ids), *offsets))
+    f.seek(end)
+    return len(plan_offsets) - 1
+
+
+def encode_columnar(plans):
+    buffer = io.BytesIO()
+    write_columnar(buffer, plans)
+    return buffer.getvalue()
+
+
+class ColumnarPlans:
+    # Zero-copy reader over a write_columnar buffer (bytes, mmap, ...); columns are memoryviews
+    def __init__(self, buffer):
+        self._view = view = memoryview(buffer)
+        (magic, version, self.plans, items, subcategories, names, plan_offsets_at, categories_at, total_units_at,
+         per_unit_cost_at, sub_offsets_at, sub_units_at, sub_names_at, name_offsets_at,
+         name_blob_at) = COLUMNAR_HEADER.unpack_from(view)
+        if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+            raise ValueError(f"not a version {COLUMNAR_VERSION} columnar plan buffer")
+
+        self.plan_offsets = view[plan_offsets_at:plan_offsets_at + 4 * (self.plans + 1)].cast("I")
+        self.categories = view[categories_at:categories_at + items].cast("B")
+        self.total_units = view[total_units_at:total_units_at + 8 * items].cast("q")
+        self.per_unit_cost = view[per_unit_cost_at:per_unit_cost_at + 8 * items].cast("q")
+        self.sub_offsets = view[sub_offsets_at:sub_offsets_at + 4 * (items + 1)].cast("I")
+        self.sub_units = view[sub_units_at:sub_units_at + 8 * subcategories].cast("q")
+        self.sub_names = view[sub_names_at:sub_names_at + 4 * subcategories].cast("I")
+        # The name table only holds distinct names, so it is decoded up front
+        name_offsets = view[name_offsets_at:name_offsets_at + 4 * (names + 1)].cast("I")
+        self.names = [str(view[name_blob_at + name_offsets[i]:name_blob_at + name_offsets[i + 1]], "utf-8")
+                      for i in range(names)]
+        name_offsets.release()
+
+    def __len__(self):
+        return self.plans
+
+    def __getitem__(self, index):
+        if not -self.plans <= index < self.plans:
+            raise IndexError("plan index out of range")
+        index %= self.plans
+        data = []
+        for item in range(self.plan_offsets[index], self.plan_offsets[index + 1]):
+            distribution = {self.names[self.sub_names[sub]]: self.sub_units[sub]
+                            for sub in range(self.sub_offsets[item], self.sub_offsets[item + 1])}
+            data.append(CategoryResult(CATEGORY_CODES[self.categories[item]], self.total_units[item],
+                                       self.per_unit_cost[item], distribution))
+        return PlanResult(tuple(data))
+
+    def __iter__(self):
+        for index in range(self.plans):
+            yield self[index]
+
+    def release(self):
+        release_views([self.plan_offsets, self.categories, self.total_units, self.per_unit_cost, self.sub_offsets,
+                       self.sub_units, self.sub_names, self._view])
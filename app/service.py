@@ -0,0 +1,452 @@
+"""Standalone asyncio HTTP planning service (stdlib only).
+
+    python -m app.service --port 8080
+    curl -X POST localhost:8080/calculate_total_drinks \
+         -d '{"number_of_attendees": 50, "per_person_budget": 20, "categories": {"BEER": ["IPA"]}}'
+    python -m app.service --load-test 20000 --concurrency 200
+    python -m app.service --capture prod.capture.jsonl    # record traffic for app.traffic replay
+
+Requests may name a "tenant"; with --config-dir those are planned with that tenant's
+config (see config_store), everything else uses the built-in config.
+
+Endpoints:
+    POST /calculate_total_drinks   compact JSON result
+    POST /recommend_products       the indented JSON produced by recommend_products
+    GET  /health                   queue depth, coalescing and cache counters
+    GET  /metrics                  engine stage timings in the Prometheus text format
+
+Identical in-flight requests share a single computation, concurrent requests are
+micro-batched into one executor call, and the pending queue is bounded: when it is
+full requests are rejected straight away with 503 instead of piling up.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from .answer_table import AnswerTable
+from .batch_planner import _is_number
+from .config_store import ConfigError, ConfigStore
+from .instrumentation import Instrumentation
+from .plan_store import PlanStore
+from .recommendation_engine import RecommendationEngine
+
+ENDPOINTS = ("calculate_total_drinks", "recommend_products")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+MAX_BODY_BYTES = 1024 * 1024
+
+JSON_TYPE = "application/json"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4"
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class ServiceOverloaded(Exception):
+    pass
+
+
+def parse_plan_request(body):
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError as e:
+        raise BadRequest(f"invalid JSON body: {e}")
+    if not isinstance(payload, dict):
+        raise BadRequest("request body must be a JSON object")
+
+    try:
+        number_of_attendees = payload["number_of_attendees"]
+        per_person_budget = payload["per_person_budget"]
+        categories = payload["categories"]
+    except KeyError as e:
+        raise BadRequest(f"missing field {e}")
+    # Same rule as batch events: finite numbers only, and true/false are not numbers
+    for name, value in (("number_of_attendees", number_of_attendees), ("per_person_budget", per_person_budget)):
+        if not _is_number(value):
+            raise BadRequest(f"{name} must be a finite number")
+    number_of_attendees = int(number_of_attendees)
+    per_person_budget = float(per_person_budget)
+
+    if number_of_attendees < 1 or per_person_budget <= 0:
+        raise BadRequest("number_of_attendees and per_person_budget must be positive")
+    if not isinstance(categories, dict) or not all(
+            isinstance(subcategories, list) and all(isinstance(s, str) for s in subcategories)
+            for subcategories in categories.values()):
+        raise BadRequest("categories must map category names to lists of subcategory names")
+    if not any(categories.values()):
+        raise BadRequest("select at least one subcategory")
+
+    tenant = payload.get("tenant")
+    if tenant is not None and not isinstance(tenant, str):
+        raise BadRequest("tenant must be a string")
+
+    return number_of_attendees, per_person_budget, categories, tenant
+
+
+class PlanningService:
+    def __init__(self, engine=None, max_queue=1024, batch_size=64, batch_window=0.002, config_store=None,
+                 plan_store=None, recorder=None):
+        self.engine = engine or RecommendationEngine(cache_size=10000, metrics=Instrumentation())
+        # Optional config_store.ConfigStore; requests naming a tenant are planned with its config
+        self.config_store = config_store
+        # Optional plan_store.PlanStore; /calculate_total_drinks results are served from and saved to it
+        self.plan_store = plan_store
+        # Optional traffic.TrafficRecorder; every planning request is captured before it is parsed
+        self.recorder = recorder
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.queue = None
+        self.inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "shed": 0, "batches": 0, "computed": 0, "errors": 0}
+        self._worker = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(self.max_queue)
+        self._worker = asyncio.create_task(self._run())
+        self._worker.add_done_callback(self._fail_pending)
+
+    def _fail_pending(self, worker):
+        # Once the worker is gone nothing will complete the queued requests: fail them
+        # instead of leaving their callers waiting forever
+        if worker.cancelled():
+            error = RuntimeError("planning service stopped")
+        else:
+            error = RuntimeError(f"planning worker died: {type(worker.exception()).__name__}: {worker.exception()}")
+        for future in self.inflight.values():
+            if not future.done():
+                future.set_exception(error)
+        self.inflight.clear()
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def engine_for(self, tenant):
+        if tenant is None or self.config_store is None:
+            return self.engine
+        return self.config_store.engine_for(tenant)
+
+    async def submit(self, endpoint, number_of_attendees, per_person_budget, categories, tenant=None):
+        self.stats["requests"] += 1
+        key = (endpoint, tenant, self.engine.cache_key(number_of_attendees, per_person_budget, categories))
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        if self._worker is None or self._worker.done():
+            raise RuntimeError("planning worker is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((key, endpoint, number_of_attendees, per_person_budget, categories, tenant, future))
+        except asyncio.QueueFull:
+            self.stats["shed"] += 1
+            raise ServiceOverloaded(f"planning queue is full ({self.max_queue} pending requests), retry later")
+        self.inflight[key] = future
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            # Give concurrent requests a short window to join the batch
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.stats["batches"] += 1
+            self.stats["computed"] += len(batch)
+            outcomes = await loop.run_in_executor(None, self._compute_batch, batch)
+            for (key, *_, future), (ok, value) in zip(batch, outcomes):
+                self.inflight.pop(key, None)
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _stored_results(self, batch):
+        # Batch position -> result for the /calculate_total_drinks requests, one plan store
+        # round trip per tenant. A tenant whose lookup fails is left to the per-request path.
+        by_tenant = {}
+        for index, (_, endpoint, number_of_attendees, per_person_budget, categories, tenant, _) in enumerate(batch):
+            if endpoint == "calculate_total_drinks":
+                by_tenant.setdefault(tenant, []).append((index, (number_of_attendees, per_person_budget, categories,
+                                                                 None)))
+        stored = {}
+        for tenant, requests in by_tenant.items():
+            try:
+                results = self.plan_store.plan_many(self.engine_for(tenant), [request for _, request in requests],
+                                                    tenant)
+            except Exception:
+                continue
+            stored.update(zip((index for index, _ in requests), results))
+        return stored
+
+    def _compute_batch(self, batch):
+        outcomes = []
+        stored = self._stored_results(batch) if self.plan_store is not None else {}
+        for index, (_, endpoint, number_of_attendees, per_person_budget, categories, tenant, _) in enumerate(batch):
+            try:
+                engine = self.engine_for(tenant)
+                if endpoint == "recommend_products":
+                    body = engine.recommend_products(number_of_attendees, per_person_budget, categories)
+                else:
+                    result = stored.get(index)
+                    if result is None:
+                        result = engine.calculate_total_drinks(number_of_attendees, per_person_budget, categories)
+                    body = json.dumps(result, separators=(",", ":"))
+                outcomes.append((True, body.encode("utf-8")))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    def health(self):
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue": self.max_queue,
+            "inflight": len(self.inflight),
+            **self.stats,
+            "cache": self.engine.cache_stats(),
+            "configs": self.config_store.stats() if self.config_store is not None else None,
+            "plan_store": self.plan_store.stats() if self.plan_store is not None else None
+        }
+
+    async def handle(self, method, path, body):
+        # Transport independent request handling, shared by the HTTP server and LocalClient.
+        # Returns (status, body bytes, content type).
+        endpoint = path.split("?", 1)[0].strip("/")
+        if endpoint == "health":
+            return 200, json.dumps(self.health()).encode("utf-8"), JSON_TYPE
+        if endpoint == "metrics":
+            if self.engine.metrics is None:
+                return 404, error_body("engine instrumentation is disabled"), JSON_TYPE
+            return 200, self.engine.metrics.prometheus_text().encode("utf-8"), PROMETHEUS_TYPE
+        if endpoint not in ENDPOINTS:
+            return 404, error_body(f"unknown endpoint /{endpoint}"), JSON_TYPE
+        if method != "POST":
+            return 405, error_body(f"/{endpoint} only accepts POST"), JSON_TYPE
+        if self.recorder is not None:
+            self.recorder.record(endpoint, body)
+
+        try:
+            args = parse_plan_request(body)
+            return 200, await self.submit(endpoint, *args), JSON_TYPE
+        except (BadRequest, ConfigError) as e:
+            return 400, error_body(str(e)), JSON_TYPE
+        except ServiceOverloaded as e:
+            return 503, error_body(str(e)), JSON_TYPE
+        except Exception as e:
+            self.stats["errors"] += 1
+            return 500, error_body(f"{type(e).__name__}: {e}"), JSON_TYPE
+
+
+def error_body(message):
+    return json.dumps({"error": message}).encode("utf-8")
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request_line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                # Longer than the reader's limit: the rest of the line cannot be skipped reliably
+                await write_response(writer, 400, error_body("request line too long"), keep_alive=False)
+                break
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await write_response(writer, 400, error_body("malformed request line"), keep_alive=False)
+                break
+
+            headers = {}
+            try:
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+            except (ValueError, asyncio.LimitOverrunError):
+                await write_response(writer, 431, error_body("request header too long"), keep_alive=False)
+                break
+
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # Without a usable length the body cannot be framed, so the connection ends here
+                await write_response(writer, 400, error_body("invalid Content-Length"), keep_alive=False)
+                break
+            if length > MAX_BODY_BYTES:
+                await write_response(writer, 413, error_body("request body too large"), keep_alive=False)
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+            status, response, content_type = await service.handle(method, path, body)
+            await write_response(writer, status, response, keep_alive, content_type)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def write_response(writer, status, body, keep_alive, content_type=JSON_TYPE):
+    headers = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == 503:
+        headers.append("Retry-After: 1")
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(service, host, port):
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+class LocalClient:
+    # In-process stand-in for an HTTP client: goes through PlanningService.handle
+    # exactly like a socket request would, without needing a listening server.
+    def __init__(self, service):
+        self.service = service
+
+    async def post(self, endpoint, payload):
+        status, body, _ = await self.service.handle("POST", f"/{endpoint}", json.dumps(payload).encode("utf-8"))
+        return status, json.loads(body)
+
+    async def get(self, endpoint):
+        status, body, content_type = await self.service.handle("GET", f"/{endpoint}", b"")
+        return status, json.loads(body) if content_type == JSON_TYPE else body.decode("utf-8")
+
+
+def sample_payloads(count, distinct=500, seed=0):
+    # Skewed synthetic traffic: a few hundred popular requests repeated many times
+    rng = random.Random(seed)
+    choices = {"LIQUOR": ["WHISKEY", "VODKA", "GIN"], "WINE": ["RED WINE", "WHITE WINE"], "BEER": ["IPA", "LAGER"]}
+    popular = []
+    for _ in range(distinct):
+        categories = {cat: subs for cat, subs in choices.items() if rng.random() < 0.6} or {"BEER": ["IPA"]}
+        popular.append({"number_of_attendees": rng.randint(1, 1000), "per_person_budget": rng.randint(1, 200),
+                        "categories": categories})
+    return [popular[min(int(rng.paretovariate(1.2)) - 1, distinct - 1)] for _ in range(count)]
+
+
+async def load_test(client, payloads, concurrency, endpoint="calculate_total_drinks"):
+    latencies = []
+    statuses = {}
+    pending = iter(payloads)
+
+    async def worker():
+        for payload in pending:
+            start = time.perf_counter()
+            status, _ = await client.post(endpoint, payload)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def run_load_test(args):
+    service = PlanningService(max_queue=args.max_queue, batch_size=args.batch_size,
+                              batch_window=args.batch_window_ms / 1000,
+                              plan_store=PlanStore(args.plan_store) if args.plan_store else None)
+    await service.start()
+    try:
+        report = await load_test(LocalClient(service), sample_payloads(args.load_test), args.concurrency)
+        report["service"] = service.health()
+    finally:
+        await service.stop()
+    print(json.dumps(report, indent=4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio HTTP planning service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-queue", type=int, default=1024, help="pending requests before shedding load")
+    parser.add_argument("--batch-size", type=int, default=64, help="max requests computed per batch")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="time to wait for a batch to fill")
+    parser.add_argument("--config-dir", help="directory of <tenant>.json configs for requests naming a tenant")
+    parser.add_argument("--answer-table", help="answer_table file used for in-domain default-config requests")
+    parser.add_argument("--plan-store", help="SQLite file persisting /calculate_total_drinks plans across restarts")
+    parser.add_argument("--capture", metavar="PATH", help="append every planning request to a traffic capture")
+    parser.add_argument("--load-test", type=int, metavar="N",
+                        help="instead of serving, push N synthetic requests through LocalClient")
+    parser.add_argument("--concurrency", type=int, default=100, help="concurrent clients for --load-test")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        asyncio.run(run_load_test(args))
+    else:
+        config_store = ConfigStore(args.config_dir, cache_size=10000) if args.config_dir else None
+        engine = None
+        if args.answer_table:
+            engine = RecommendationEngine(cache_size=10000, metrics=Instrumentation(),
+                                          answer_table=AnswerTable(args.answer_table))
+        plan_store = PlanStore(args.plan_store) if args.plan_store else None
+        recorder = None
+        if args.capture:
+            from .traffic import TrafficRecorder
+
+            recorder = TrafficRecorder(args.capture)
+        service = PlanningService(engine=engine, max_queue=args.max_queue, batch_size=args.batch_size,
+                                  batch_window=args.batch_window_ms / 1000, config_store=config_store,
+                                  plan_store=plan_store, recorder=recorder)
+        try:
+            asyncio.run(serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""In-memory search index over the subcategory taxonomy.
+
+Names are folded to accent-free, case-free word tokens ("Rosé Wine" -> rose, wine).
+Subcategories of a category whose token sets are equal are aliases of each other
+("ROSE WINE" / "ROSÉ WINE", "WHISKY - CANADIAN" / "CANADIAN WHISKY") and collapse to
+the first one listed; more aliases can be passed explicitly. The same name under two
+categories ("MALT LIQUOR" in BEER and LIQUOR) stays two subcategories, since the
+category decides how units are planned.
+
+A query matches a subcategory when every query word matches one of its words (or one
+of its aliases' words): exactly, as a prefix (bisect over the sorted vocabulary) or
+within a small edit distance, found through a trigram index of the vocabulary:
+
+    index = SubcategoryIndex(CATEGORY_MAP)
+    index.search("canadian whisky")            # word order does not matter
+    index.search("rose", "WINE")               # nor do accents
+    index.search("hefewiezen")                 # nor a typo: WEISSBIER - HEFEWEIZEN
+    index.page("ipa", "BEER", number=0, size=20)
+    index.canonicalize({"WINE": ["ROSE WINE", "ROSÉ WINE"]})   # {"WINE": ["ROSÉ WINE"]}
+"""
+import bisect
+import re
+import unicodedata
+from typing import NamedTuple
+
+from .lru_cache import LRUCache
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Match scores per query word
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+
+def fold(text):
+    # Case-free text without accents: "Rosé" -> "rose"
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokens(text):
+    return _WORD.findall(fold(text))
+
+
+def alias_key(name):
+    # Names with the same key are the same subcategory written differently
+    return " ".join(sorted(set(tokens(name))))
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token):
+    # Typos tolerated in a query word of this length
+    if len(token) <= 2:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance, or limit + 1 as soon as it must exceed limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class Subcategory(NamedTuple):
+    category: str
+    name: str
+    aliases: tuple
+
+
+class Page(NamedTuple):
+    items: list
+    number: int
+    pages: int
+    total: int
+
+
+class SubcategoryIndex:
+    def __init__(self, category_map, aliases=None, cache_size=256):
+        # aliases: {category: {alias: canonical name}} for variants folding cannot catch
+        self.entries = []
+        self._canonical = {}
+        by_key = {}
+        entry_words = []
+        for category, names in category_map.items():
+            for name in names:
+                key = (category, alias_key(name))
+                entry = by_key.get(key)
+                if entry is None:
+                    entry = by_key[key] = len(self.entries)
+                    self.entries.append(Subcategory(category, name, ()))
+                    entry_words.append(set())
+                elif name != self.entries[entry].name:
+                    self.entries[entry] = self.entries[entry]._replace(aliases=self.entries[entry].aliases + (name,))
+                self._canonical[(category, name)] = entry
+                entry_words[entry].update(tokens(name))
+        for category, mapping in (aliases or {}).items():
+            for alias, name in mapping.items():
+                entry = self._canonical.get((category, name))
+                if entry is None:
+                    raise ValueError(f"alias {alias!r} points at unknown subcategory {category}/{name}")
+                self._canonical[(category, alias)] = entry
+                self.entries[entry] = self.entries[entry]._replace(aliases=self.entries[entry].aliases + (alias,))
+                entry_words[entry].update(tokens(alias))
+
+        self._sizes = [len(words) for words in entry_words]
+        self._postings = {}
+        for entry, words in enumerate(entry_words):
+            for word in words:
+                self._postings.setdefault(word, set()).add(entry)
+        self._vocabulary = sorted(self._postings)
+        self._trigrams = {}
+        self._by_length = {}
+        for word in self._vocabulary:
+            for gram in trigrams(word):
+                self._trigrams.setdefault(gram, []).append(word)
+            self._by_length.setdefault(len(word), []).append(word)
+        self._by_category = {}
+        for entry, subcategory in enumerate(self.entries):
+            self._by_category.setdefault(subcategory.category, []).append(entry)
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def canonical(self, category, name):
+        # Canonical name of a subcategory or one of its aliases; other names pass unchanged
+        entry = self._canonical.get((category, name))
+        return name if entry is None else self.entries[entry].name
+
+    def canonicalize(self, categories):
+        # A calculate_total_drinks categories dict with aliases replaced and collapsed
+        canonical = {}
+        for category, names in categories.items():
+            collapsed = []
+            for name in names:
+                name = self.canonical(category, name)
+                if name not in collapsed:
+                    collapsed.append(name)
+            canonical[category] = collapsed
+        return canonical
+
+    def subcategories(self, category):
+        return [self.entries[entry] for entry in self._by_category.get(category, [])]
+
+    def _prefixed(self, word):
+        # Vocabulary words starting with word, via bisect on the sorted vocabulary
+        vocabulary = self._vocabulary
+        position = bisect.bisect_left(vocabulary, word)
+        while position < len(vocabulary) and vocabulary[position].startswith(word):
+            yield vocabulary[position]
+            position += 1
+
+    def _similar(self, word):
+        # Vocabulary words within max_edits(word) edits. Each edit breaks at most three
+        # trigrams, so a word sharing fewer cannot be that close; when that bound says
+        # nothing (short words) the candidates are all words of a compatible length.
+        limit = max_edits(word)
+        if not limit:
+            return
+        grams = trigrams(word)
+        needed = len(grams) - 3 * limit
+        if needed > 0:
+            shared = {}
+            for gram in grams:
+                for candidate in self._trigrams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            candidates = [candidate for candidate, count in shared.items() if count >= needed]
+        else:
+            candidates = [candidate for length in range(len(word) - limit, len(word) + limit + 1)
+                          for candidate in self._by_length.get(length, ())]
+        for candidate in candidates:
+            if edit_distance(word, candidate, limit) <= limit:
+                yield candidate
+
+    def _word_scores(self, word):
+        # Entry -> best score of one query word
+        scores = {}
+        for entry in self._postings.get(word, ()):
+            scores[entry] = EXACT
+        for match in self._prefixed(word):
+            for entry in self._postings[match]:
+                scores.setdefault(entry, PREFIX)
+        for match in self._similar(word):
+            for entry in self._postings[match]:
+                scores.setdefault(entry, FUZZY)
+        return scores
+
+    def _search(self, query, category):
+        words = tokens(query)
+        if not words:
+            return list(self._by_category.get(category, ())) if category is not None else list(range(len(self.entries)))
+        totals = None
+        for word in dict.fromkeys(words):
+            scores = self._word_scores(word)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {entry: total + scores[entry] for entry, total in totals.items() if entry in scores}
+            if not totals:
+                return []
+        matches = [entry for entry in totals if category is None or self.entries[entry].category == category]
+        # Best scores first, then names with fewer other words, then taxonomy order
+        matches.sort(key=lambda entry: (-totals[entry], self._sizes[entry], entry))
+        return matches
+
+    def _matches(self, query, category):
+        key = (fold(query).strip(), category)
+        matches = self.cache.get(key) if self.cache is not None else None
+        if matches is None:
+            matches = self._search(query, category)
+            if self.cache is not None:
+                self.cache.put(key, matches)
+        return matches
+
+    def search(self, query, category=None, limit=None):
+        return [self.entries[entry] for entry in self._matches(query, category)[:limit]]
+
+    def page(self, query, category=None, number=0, size=30):
+        # One page of search results; number is clamped to the pages there are
+        matches = self._matches(query, category)
+        pages = max(1, -(-len(matches) // size))
+        number = min(max(number, 0), pages - 1)
+        return Page([self.entries[entry] for entry in matches[number * size:(number + 1) * size]], number, pages,
+                    len(matches))
@@ -0,0 +1,363 @@
+"""Planning traffic capture and replay.
+
+A capture is JSON lines, one planning request per line, in arrival order:
+
+    {"ts": 1760800000.123, "endpoint": "calculate_total_drinks", "body": {...request JSON...}}
+
+Bodies that are not valid JSON are kept as text under "raw" so they replay as the same
+bad request. `python -m app.service --capture prod.capture.jsonl` records everything
+the service receives; TrafficRecorder can be attached to any other entry point.
+
+Replaying sends the captured requests again with their original spacing, divided by
+--speed (2 = twice as fast); --speed 0 ignores the timestamps and sends as fast as
+--concurrency allows:
+
+    python -m app.traffic replay prod.capture.jsonl --target engine --speed 4
+    python -m app.traffic replay prod.capture.jsonl --target service --save report.json
+    python -m app.traffic replay prod.capture.jsonl --target http://127.0.0.1:8080 --compare report.json
+    python -m app.traffic synth demo.capture.jsonl --count 20000 --qps 500
+
+Targets: "engine" calls RecommendationEngine in-process, "service" goes through a
+PlanningService via LocalClient, an http:// URL sends real requests to a running
+app.service. The report has latency percentiles, throughput, status counts, error
+rate and the engine cache hit ratio over the run. When pacing, latency is measured
+from the time a request was due, so a target that falls behind shows up in the
+percentiles instead of silently slowing the replay down.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from .config_store import ConfigError
+from .instrumentation import Instrumentation
+from .recommendation_engine import RecommendationEngine
+from .service import ENDPOINTS, BadRequest, PlanningService, parse_plan_request, sample_payloads
+
+
+class CapturedRequest(NamedTuple):
+    ts: float
+    endpoint: str
+    body: bytes
+
+
+class TrafficRecorder:
+    # Appends one JSON line per request; safe to share between threads. A background
+    # thread flushes every flush_interval seconds, so a killed service loses at most that
+    # much of its capture even when traffic stops; close() flushes the rest.
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="traffic-recorder-flush", daemon=True)
+        self._flusher.start()
+
+    def record(self, endpoint, body, ts=None):
+        entry = {"ts": time.time() if ts is None else ts, "endpoint": endpoint}
+        try:
+            entry["body"] = json.loads(body or b"{}")
+        except ValueError:
+            entry["raw"] = body.decode("utf-8", "replace")
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self.recorded += 1
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._lock:
+            self._file.close()
+
+
+def read_capture(path):
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                body = entry["raw"] if "raw" in entry else json.dumps(entry["body"])
+                requests.append(CapturedRequest(float(entry["ts"]), entry["endpoint"], body.encode("utf-8")))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{number}: not a capture line ({e})")
+    requests.sort(key=lambda request: request.ts)
+    return requests
+
+
+def synthesize(path, count, qps, seed=0):
+    # A capture of service.sample_payloads traffic with Poisson arrivals at qps
+    rng = random.Random(seed)
+    ts = time.time()
+    with open(path, "w", encoding="utf-8") as f:
+        for payload in sample_payloads(count, seed=seed):
+            ts += rng.expovariate(qps)
+            f.write(json.dumps({"ts": ts, "endpoint": "calculate_total_drinks", "body": payload},
+                               separators=(",", ":")) + "\n")
+
+
+class EngineTarget:
+    # Calls the engine directly, in the event loop thread: one request at a time
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def send(self, endpoint, body):
+        if endpoint not in ENDPOINTS:
+            return 404
+        try:
+            number_of_attendees, per_person_budget, categories, _ = parse_plan_request(body)
+            if endpoint == "recommend_products":
+                self.engine.recommend_products(number_of_attendees, per_person_budget, categories)
+            else:
+                json.dumps(self.engine.calculate_total_drinks(number_of_attendees, per_person_budget, categories),
+                           separators=(",", ":"))
+            return 200
+        except (BadRequest, ConfigError):
+            return 400
+        except Exception:
+            return 500
+
+    async def stats(self):
+        return {"cache": self.engine.cache_stats()}
+
+
+class ServiceTarget:
+    # A PlanningService in this process, called through PlanningService.handle like LocalClient
+    def __init__(self, service):
+        self.service = service
+
+    async def start(self):
+        await self.service.start()
+
+    async def stop(self):
+        await self.service.stop()
+
+    async def send(self, endpoint, body):
+        status, _, _ = await self.service.handle("POST", f"/{endpoint}", body)
+        return status
+
+    async def stats(self):
+        return self.service.health()
+
+
+class HttpTarget:
+    # Minimal keep-alive HTTP/1.1 client for a running app.service
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self._idle = []
+
+    async def _request(self, method, path, body=b""):
+        reader, writer = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            response = await reader.readexactly(int(headers.get("content-length") or 0))
+        except Exception:
+            writer.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return status, response
+
+    async def stop(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+    async def send(self, endpoint, body):
+        status, _ = await self._request("POST", f"/{endpoint}", body)
+        return status
+
+    async def stats(self):
+        _, body = await self._request("GET", "/health")
+        return json.loads(body)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+def cache_delta(before, after):
+    # Engine LRU hits / misses during the run, from two stats snapshots
+    before_cache, after_cache = (before or {}).get("cache"), (after or {}).get("cache")
+    if not after_cache:
+        return None
+    hits = after_cache["hits"] - (before_cache or {}).get("hits", 0)
+    misses = after_cache["misses"] - (before_cache or {}).get("misses", 0)
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+
+
+async def replay(target, requests, speed=1.0, concurrency=64):
+    # Sends requests to target; speed scales the captured spacing (0: no pacing).
+    # Returns the report dict.
+    latencies = []
+    lags = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    first = requests[0].ts if requests else 0.0
+
+    async def send(request, due):
+        try:
+            started = loop.time()
+            try:
+                status = await target.send(request.endpoint, request.body)
+            except Exception:
+                status = "error"
+            finished = loop.time()
+            # Paced: measured from when the request was due, queueing behind slow ones included
+            latencies.append(finished - (due if due is not None else started))
+            statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            semaphore.release()
+
+    before = await target.stats()
+    start = loop.time()
+    tasks = []
+    for request in requests:
+        due = start + (request.ts - first) / speed if speed else None
+        if due is not None and due > loop.time():
+            await asyncio.sleep(due - loop.time())
+        await semaphore.acquire()
+        if due is not None:
+            lags.append(loop.time() - due)
+        tasks.append(asyncio.ensure_future(send(request, due)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    after = await target.stats()
+
+    latencies.sort()
+    lags.sort()
+    errors = sum(count for status, count in statuses.items() if status == "error" or status >= 500)
+    rejected = sum(count for status, count in statuses.items() if status != "error" and 400 <= status < 500)
+    captured_seconds = (requests[-1].ts - first) if requests else 0.0
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "captured_seconds": captured_seconds,
+        "speed": speed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "send_lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "error_rate": errors / len(latencies) if latencies else 0.0,
+        "client_error_rate": rejected / len(latencies) if latencies else 0.0,
+        "cache": cache_delta(before, after),
+        "target": after,
+    }
+
+
+def compare(report, baseline, threshold=0.2):
+    # Regressions of report against a saved baseline report, as messages
+    failures = []
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if report[key] > baseline[key] * (1 + threshold):
+            failures.append(f"{key} {report[key]:.2f} vs {baseline[key]:.2f}")
+    if report["requests_per_sec"] < baseline["requests_per_sec"] * (1 - threshold):
+        failures.append(f"requests_per_sec {report['requests_per_sec']:.0f} vs {baseline['requests_per_sec']:.0f}")
+    if report["error_rate"] > baseline["error_rate"] + 0.001:
+        failures.append(f"error_rate {report['error_rate']:.4f} vs {baseline['error_rate']:.4f}")
+    return failures
+
+
+def make_target(name, args):
+    if name.startswith("http://"):
+        return HttpTarget(name)
+    engine = RecommendationEngine(cache_size=args.cache_size, metrics=Instrumentation())
+    if name == "engine":
+        return EngineTarget(engine)
+    if name == "service":
+        return ServiceTarget(PlanningService(engine=engine, max_queue=args.max_queue))
+    raise ValueError(f"unknown target {name!r}: use engine, service or an http:// URL")
+
+
+async def run_replay(args):
+    requests = read_capture(args.capture)[:args.limit]
+    target = make_target(args.target, args)
+    if hasattr(target, "start"):
+        await target.start()
+    try:
+        return await replay(target, requests, args.speed, args.concurrency)
+    finally:
+        if hasattr(target, "stop"):
+            await target.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture and replay planning traffic.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("replay", help="replay a capture and report latency and errors")
+    replay_parser.add_argument("capture")
+    replay_parser.add_argument("--target", default="engine", help="engine, service or http://host:port")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="multiplier on the captured request rate, 0 for as fast as possible")
+    replay_parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    replay_parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    replay_parser.add_argument("--cache-size", type=int, default=10000, help="engine cache for in-process targets")
+    replay_parser.add_argument("--max-queue", type=int, default=1024, help="service queue for --target service")
+    replay_parser.add_argument("--save", metavar="PATH", help="write the report as JSON")
+    replay_parser.add_argument("--compare", metavar="PATH", help="baseline report to check for regressions")
+    replay_parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+
+    synth_parser = commands.add_parser("synth", help="write a synthetic capture")
+    synth_parser.add_argument("capture")
+    synth_parser.add_argument("--count", type=int, default=10000)
+    synth_parser.add_argument("--qps", type=float, default=200.0)
+    synth_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == "synth":
+        synthesize(args.capture, args.count, args.qps, args.seed)
+        return
+
+    report = asyncio.run(run_replay(args))
+    print(json.dumps(report, indent=4))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            failures = compare(report, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
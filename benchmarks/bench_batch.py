@@ -0,0 +1,111 @@
+# Compares the per-event calculate_total_drinks loop against calculate_total_drinks_batch
+#
+#   python benchmarks/bench_batch.py --events 20000
+#
+# Also checks that apportion_batch gives the same counts as the scalar apportion, for
+# random integer and float weights (as lists and float arrays) and for exact remainder ties.
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.recommendation_engine import RecommendationEngine, apportion, apportion_batch  # noqa: E402
+
+SUBCATEGORIES = {
+    "LIQUOR": ["WHISKEY", "VODKA", "GIN"],
+    "WINE": ["RED WINE", "WHITE WINE"],
+    "BEER": ["IPA", "LAGER", "STOUT"],
+}
+
+
+def make_events(count, seed):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        chosen = [cat for cat in SUBCATEGORIES if rng.random() < 0.6] or ["BEER"]
+        events.append((rng.randint(1, 1000), rng.randint(1, 1000),
+                       {cat: SUBCATEGORIES[cat] for cat in chosen}))
+    return events
+
+
+def to_columns(events):
+    attendees = np.array([event[0] for event in events], dtype=np.int64)
+    budgets = np.array([event[1] for event in events], dtype=np.float64)
+    categories = {cat: np.array([cat in event[2] for event in events]) for cat in SUBCATEGORIES}
+    return attendees, budgets, categories
+
+
+def check_matches(scalar_results, batch_results):
+    for i, scalar in enumerate(scalar_results):
+        for item in scalar["data"]:
+            column = batch_results["data"][item["category"]]
+            if (column["total_units"][i] != item["total_units"]
+                    or column["per_unit_cost"][i] != item["per_unit_cost"]):
+                raise AssertionError(f"event {i} {item['category']}: scalar {item} != batch "
+                                     f"{column['total_units'][i]} / {column['per_unit_cost'][i]}")
+
+
+# (total_units, weights) whose remainders tie exactly, so the tie-break rule decides
+TIES = [
+    (873540, [5, 3]),
+    (873540, [5.0, 3.0]),
+    (10, [1, 1, 1, 1]),
+    (7, [2, 0, 2, 2]),
+]
+
+
+def check_apportion(count, seed):
+    rng = random.Random(seed)
+    cases = list(TIES)
+    for _ in range(count):
+        size = rng.randint(1, 8)
+        if rng.random() < 0.5:
+            weights = [rng.randint(0, 9) for _ in range(size)]
+        else:
+            weights = [round(rng.uniform(0, 3), rng.randint(0, 3)) for _ in range(size)]
+        cases.append((rng.randint(0, 10 ** 6), weights))
+    for total_units, weights in cases:
+        if not any(weights):
+            continue  # apportion splits these evenly, apportion_batch leaves them out
+        scalar = apportion(total_units, weights)
+        # Float arrays too: columns loaded from data files are float even for whole numbers
+        for batch_weights in (weights, np.asarray(weights, dtype=np.float64)):
+            batch = apportion_batch([total_units], batch_weights)[0].tolist()
+            if scalar != batch:
+                raise AssertionError(f"apportion({total_units}, {weights}): scalar {scalar} != batch {batch}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    events = make_events(args.events, args.seed)
+    attendees, budgets, categories = to_columns(events)
+
+    start = time.perf_counter()
+    scalar_results = [engine.calculate_total_drinks(*event) for event in events]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = engine.calculate_total_drinks_batch(attendees, budgets, categories)
+    batch_seconds = time.perf_counter() - start
+
+    check_matches(scalar_results, batch_results)
+    check_apportion(args.events, args.seed)
+
+    print(f"events:          {args.events}")
+    print(f"per-event loop:  {args.events / scalar_seconds:,.0f} events/sec")
+    print(f"batch:           {args.events / batch_seconds:,.0f} events/sec")
+    print(f"speedup:         {scalar_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Checks that calculate_total_drinks_batch(..., out=BatchBuffers) allocates nothing per event
+#
+#   python benchmarks/bench_batch_buffers.py --events 100000 --calls 50
+#
+# After one warm-up call, --calls repeated calls into the same buffers are traced with
+# tracemalloc. The check fails (exit status 1) when traced memory grows across calls, or
+# when the peak a single call allocates grows with the number of events: the peak is
+# measured for three batch sizes, doubling from max(events / 4, 4 * np.getbufsize()), and
+# may only differ by --slack bytes between them. Those sizes are all larger than numpy's
+# fixed size ufunc buffers, which are what is left of the peak, so the check does not
+# depend on --events. Results, including subcategory counts, are compared with the
+# allocating batch path plus apportion_batch, and both are timed.
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.batch_buffers import BatchBuffers  # noqa: E402
+from app.recommendation_engine import RecommendationEngine, apportion_batch  # noqa: E402
+from bench_batch import SUBCATEGORIES, make_events, to_columns  # noqa: E402
+
+
+def traced(engine, columns, out, weights, calls):
+    # (traced memory growth over the calls, largest peak of a single call) in bytes
+    engine.calculate_total_drinks_batch(*columns, out=out, subcategory_weights=weights)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        peak = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            engine.calculate_total_drinks_batch(*columns, out=out, subcategory_weights=weights)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+        return tracemalloc.get_traced_memory()[0] - before, peak
+    finally:
+        tracemalloc.stop()
+
+
+def check_matches(engine, columns, out, weights):
+    expected = engine.calculate_total_drinks_batch(*columns)
+    for category, column in expected["data"].items():
+        for field, values in column.items():
+            if not np.array_equal(out.results[category][field][:out.size], values):
+                raise AssertionError(f"{category} {field} differs from the allocating batch path")
+    for category, counts in allocating(engine, columns, weights).items():
+        if not np.array_equal(out.subcategories[category][:out.size], counts):
+            raise AssertionError(f"{category} subcategory counts differ from apportion_batch")
+
+
+def allocating(engine, columns, weights):
+    # The same work without buffers: the batch path plus apportion_batch per category
+    results = engine.calculate_total_drinks_batch(*columns)
+    return {category: apportion_batch(column["total_units"],
+                                      weights.get(category, np.ones(len(SUBCATEGORIES[category]), np.int64)))
+            for category, column in results["data"].items()}
+
+
+def setup(events, seed):
+    columns = to_columns(make_events(events, seed))
+    rng = np.random.default_rng(seed)
+    # Popularity weights for beer, 0 meaning the event did not order that style
+    weights = {"BEER": rng.integers(0, 5, (events, len(SUBCATEGORIES["BEER"])))}
+    counts = {category: len(subcategories) for category, subcategories in SUBCATEGORIES.items()}
+    return columns, BatchBuffers(SUBCATEGORIES, events, counts), weights
+
+
+def peak_sizes(events):
+    # Batch sizes whose per-call peaks are compared: all well above numpy's ufunc buffer
+    # (np.getbufsize() elements), below which buffering alone makes the peak grow
+    smallest = max(events // 4, 4 * np.getbufsize())
+    return [smallest, 2 * smallest, 4 * smallest]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slack", type=int, default=16384, help="allowed difference in per-call peak bytes")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    columns, out, weights = setup(args.events, args.seed)
+    counts = out.subcategory_counts
+
+    growth, _ = traced(engine, columns, out, weights, args.calls)
+    peaks = {size: traced(engine, *setup(size, args.seed), min(args.calls, 5))[1] for size in peak_sizes(args.events)}
+    check_matches(engine, columns, out, weights)
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        allocating(engine, columns, weights)
+    allocating_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        engine.calculate_total_drinks_batch(*columns, out=out, subcategory_weights=weights)
+    buffered_seconds = time.perf_counter() - start
+
+    print(f"events:              {args.events} x {args.calls} calls")
+    print(f"buffers:             {BatchBuffers.nbytes(SUBCATEGORIES, args.events, counts):,} bytes")
+    print(f"traced growth:       {growth:,} bytes over {args.calls} calls")
+    print(f"peak per call:       {', '.join(f'{peak:,} bytes for {size}' for size, peak in peaks.items())} events")
+    print(f"allocating batch:    {args.events * args.calls / allocating_seconds:,.0f} events/sec")
+    print(f"into buffers:        {args.events * args.calls / buffered_seconds:,.0f} events/sec")
+
+    failures = []
+    if growth > args.slack:
+        failures.append(f"traced memory grew by {growth:,} bytes over {args.calls} calls")
+    if max(peaks.values()) - min(peaks.values()) > args.slack:
+        failures.append(f"per-call peak grows with the batch: {sorted(peaks.values())}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
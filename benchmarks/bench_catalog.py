@@ -0,0 +1,69 @@
+# Builds a synthetic SKU catalog over every CATEGORY_MAP subcategory, then times opening
+# it and nearest-price lookups against a linear scan of the same subcategory
+#
+#   python benchmarks/bench_catalog.py --skus 500000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.catalog import Catalog, write_catalog  # noqa: E402
+from app.categories import CATEGORY_MAP  # noqa: E402
+
+
+def synthetic_skus(count, seed):
+    rng = random.Random(seed)
+    keys = [(category, subcategory) for category, subcategories in CATEGORY_MAP.items()
+            for subcategory in subcategories]
+    for number in range(count):
+        category, subcategory = rng.choice(keys)
+        yield (f"SKU{number:08d}", f"{subcategory.title()} #{number}", category, subcategory,
+               round(rng.lognormvariate(3, 0.8), 2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=500000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.skucat")
+    start = time.perf_counter()
+    write_catalog(path, synthetic_skus(args.skus, args.seed))
+    print(f"build:        {time.perf_counter() - start:.2f}s, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    catalog = Catalog(path)
+    print(f"open:         {(time.perf_counter() - start) * 1000:.2f} ms for {len(catalog):,} SKUs")
+
+    rng = random.Random(args.seed)
+    keys = catalog.subcategories()
+    queries = [(*rng.choice(keys), rng.uniform(5, 80)) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    for category, subcategory, price in queries:
+        catalog.nearest(category, subcategory, price, k=3)
+    elapsed = time.perf_counter() - start
+    print(f"nearest (k=3): {args.lookups / elapsed:,.0f} lookups/sec")
+
+    scans = max(1, args.lookups // 100)
+    start = time.perf_counter()
+    for category, subcategory, price in queries[:scans]:
+        rows = range(*catalog.row_range(category, subcategory))
+        sorted(rows, key=lambda row: abs(catalog.prices[row] - price))[:3]
+    elapsed = time.perf_counter() - start
+    print(f"linear scan:  {scans / elapsed:,.0f} lookups/sec")
+
+    category, subcategory, price = queries[0]
+    for sku in catalog.nearest(category, subcategory, price, k=3):
+        print(f"  {category}/{subcategory} near {price:.2f}: {sku.sku} {sku.price:.2f} {sku.name}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# Latency/throughput/allocation benchmark for RecommendationEngine with regression checks
+#
+#   python benchmarks/bench_engine.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/bench_engine.py --compare benchmarks/baseline.json --threshold 0.25
+#
+# Sweeps attendee counts (past the UI's 1000 cap), every category combination and
+# subcategory list sizes up to the full CATEGORY_MAP. Each case reports per-call latency
+# percentiles, calls/sec and the peak bytes allocated per call (tracemalloc). With
+# --compare the run exits with status 1 when the geometric mean of p50 latencies grows
+# by more than --threshold, a single case slows down by more than --case-threshold, or
+# a case's allocation per call grows by more than --threshold.
+import argparse
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.categories import CATEGORY_MAP  # noqa: E402
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+
+ATTENDEES = (1, 10, 50, 250, 1000, 5000, 20000)
+SUBCATEGORY_SIZES = (1, 3, 10, "full")
+PER_PERSON_BUDGET = 25
+
+
+def category_sets():
+    names = tuple(CATEGORY_MAP)
+    for size in range(1, len(names) + 1):
+        yield from itertools.combinations(names, size)
+
+
+def build_categories(category_set, size):
+    return {
+        cat: list(CATEGORY_MAP[cat]) if size == "full" else list(CATEGORY_MAP[cat][:size])
+        for cat in category_set
+    }
+
+
+def cases():
+    for attendees, category_set, size in itertools.product(ATTENDEES, category_sets(), SUBCATEGORY_SIZES):
+        case_id = f"total_drinks/n={attendees}/{'+'.join(category_set)}/subs={size}"
+        categories = build_categories(category_set, size)
+        yield case_id, "calculate_total_drinks", (attendees, PER_PERSON_BUDGET, categories)
+
+    # allocate_subcategories on its own, for large unit totals and the full subcategory lists
+    for total_units, size in itertools.product((10, 1000, 100000), SUBCATEGORY_SIZES):
+        subcategories = list(CATEGORY_MAP["BEER"]) if size == "full" else list(CATEGORY_MAP["BEER"][:size])
+        case_id = f"allocate_subcategories/units={total_units}/subs={size}"
+        yield case_id, "allocate_subcategories", ("BEER", subcategories, total_units, 5)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, args, calls, rounds, alloc_calls):
+    for _ in range(min(20, calls)):
+        func(*args)
+
+    # The regression check uses the best round median, which is far less sensitive to
+    # scheduler noise than a single pass; the tail percentiles pool every round
+    timings = []
+    round_medians = []
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            round_timings = []
+            for _ in range(calls):
+                start = time.perf_counter()
+                func(*args)
+                round_timings.append(time.perf_counter() - start)
+            round_timings.sort()
+            round_medians.append(percentile(round_timings, 0.50))
+            timings.extend(round_timings)
+    finally:
+        gc.enable()
+    timings.sort()
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(alloc_calls):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        func(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "p50_us": min(round_medians) * 1e6,
+        "p95_us": percentile(timings, 0.95) * 1e6,
+        "p99_us": percentile(timings, 0.99) * 1e6,
+        "calls_per_sec": len(timings) / sum(timings),
+        "peak_alloc_bytes": sorted(peaks)[len(peaks) // 2],
+    }
+
+
+def run(calls, rounds, alloc_calls, pattern=None):
+    engine = RecommendationEngine()
+    results = {}
+    for case_id, method, args in cases():
+        if pattern and pattern not in case_id:
+            continue
+        results[case_id] = measure(getattr(engine, method), args, calls, rounds, alloc_calls)
+    return results
+
+
+def compare(results, baseline, threshold, case_threshold, min_delta_us):
+    # Two gates: the geometric mean of p50 ratios over all shared cases must stay within
+    # threshold (robust against single noisy cases), and no individual case may exceed
+    # case_threshold. Peak allocation per call is checked per case against threshold.
+    regressions = []
+    log_ratios = []
+    for case_id, current in results.items():
+        previous = baseline["cases"].get(case_id)
+        if previous is None:
+            continue
+        log_ratios.append(math.log(current["p50_us"] / previous["p50_us"]))
+        delta_us = current["p50_us"] - previous["p50_us"]
+        if delta_us > min_delta_us and current["p50_us"] > previous["p50_us"] * (1 + case_threshold):
+            regressions.append(f"{case_id}: p50 {previous['p50_us']:.1f}us -> {current['p50_us']:.1f}us")
+        if current["peak_alloc_bytes"] > previous["peak_alloc_bytes"] * (1 + threshold) + 256:
+            regressions.append(f"{case_id}: peak alloc {previous['peak_alloc_bytes']}B -> "
+                               f"{current['peak_alloc_bytes']}B")
+
+    geomean = math.exp(sum(log_ratios) / len(log_ratios)) if log_ratios else 1.0
+    if geomean > 1 + threshold:
+        regressions.insert(0, f"overall: geometric mean p50 ratio {geomean:.2f} over {len(log_ratios)} cases")
+    return geomean, regressions
+
+
+def print_summary(results):
+    print(f"{'case':<72} {'p50us':>8} {'p95us':>8} {'p99us':>8} {'calls/s':>10} {'allocB':>8}")
+    for case_id, r in results.items():
+        print(f"{case_id:<72} {r['p50_us']:>8.1f} {r['p95_us']:>8.1f} {r['p99_us']:>8.1f} "
+              f"{r['calls_per_sec']:>10,.0f} {r['peak_alloc_bytes']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100, help="timed calls per round")
+    parser.add_argument("--rounds", type=int, default=5, help="timing rounds per case")
+    parser.add_argument("--alloc-calls", type=int, default=20, help="tracemalloc calls per case")
+    parser.add_argument("--filter", help="only run cases whose id contains this string")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed overall slowdown and per-case allocation growth (0.25 = 25%%)")
+    parser.add_argument("--case-threshold", type=float, default=1.0,
+                        help="allowed slowdown of any single case (1.0 = 2x)")
+    parser.add_argument("--min-delta-us", type=float, default=2.0,
+                        help="ignore p50 slowdowns smaller than this many microseconds (timer noise)")
+    parser.add_argument("--quiet", action="store_true", help="do not print the per-case table")
+    args = parser.parse_args(argv)
+
+    results = run(args.calls, args.rounds, args.alloc_calls, args.filter)
+    if not args.quiet:
+        print_summary(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                         "calls": args.calls, "rounds": args.rounds, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                "cases": results
+            }, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        geomean, regressions = compare(results, baseline, args.threshold, args.case_threshold, args.min_delta_us)
+        print(f"geometric mean p50 ratio vs baseline: {geomean:.3f}")
+        if regressions:
+            print(f"{len(regressions)} regression(s):")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Throughput and accuracy of LiveForecast on a simulated event
+#
+#   python benchmarks/bench_live.py --attendees 50000
+#
+# Plans a 5 hour festival, then streams single-unit sales at uniformly random times:
+# IPA sells 1.5x its planned units over the event, every other subcategory 0.7x (about
+# 100k sales for 50k attendees). Checks that IPA raises a reorder alert, that nothing
+# else does, and that mid-event projections are close to the true totals, then reports
+# sales processed per second.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.live import LiveForecast  # noqa: E402
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+
+CATEGORIES = {
+    "LIQUOR": ["WHISKEY", "VODKA", "GIN"],
+    "WINE": ["RED WINE", "WHITE WINE"],
+    "BEER": ["IPA", "LAGER", "STOUT"],
+}
+DURATION = 5 * 3600
+OVERSOLD = ("BEER", "IPA")
+
+
+def make_sales(forecast, seed):
+    rng = random.Random(seed)
+    demand = {key: round(item.planned * (1.5 if key == OVERSOLD else 0.7)) for key, item in forecast.items.items()}
+    sales = [(rng.uniform(forecast.start, forecast.end), key[0], key[1], 1)
+             for key, units in demand.items() for _ in range(units)]
+    sales.sort()
+    return sales, demand
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--attendees", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    forecast = LiveForecast.plan(engine, args.attendees, 60, CATEGORIES, start=0.0, duration=DURATION)
+    sales, demand = make_sales(forecast, args.seed)
+
+    start = time.perf_counter()
+    alerts = forecast.consume(sales)
+    seconds = time.perf_counter() - start
+
+    reorders = {(alert.category, alert.subcategory) for alert in alerts if alert.kind == "reorder"}
+    if OVERSOLD not in reorders:
+        raise AssertionError(f"no reorder alert for {OVERSOLD}")
+    if reorders - {OVERSOLD}:
+        raise AssertionError(f"unexpected reorder alerts: {sorted(reorders - {OVERSOLD})}")
+
+    # Half way through, projections should be near the true demand
+    half = LiveForecast.plan(engine, args.attendees, 60, CATEGORIES, start=0.0, duration=DURATION)
+    half.consume(sale for sale in sales if sale[0] <= DURATION / 2)
+    worst = max(abs(projection.projected / demand[(projection.category, projection.subcategory)] - 1)
+                for projection in half.forecast(DURATION / 2))
+
+    print(f"sales:                {len(sales)}")
+    print(f"throughput:           {len(sales) / seconds:,.0f} sales/sec")
+    print(f"alerts:               {len(alerts)} ({', '.join(sorted({alert.kind for alert in alerts}))})")
+    first = next(alert for alert in alerts if (alert.category, alert.subcategory) == OVERSOLD)
+    print(f"first {OVERSOLD[1]} alert:      {first.ts / 3600:.2f} h into the event, projected {first.projected:.0f} "
+          f"vs {first.available} in stock")
+    print(f"mid-event projection: within {worst:.1%} of actual demand")
+
+
+if __name__ == "__main__":
+    main()
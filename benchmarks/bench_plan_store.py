@@ -0,0 +1,70 @@
+# PlanStore against the engine, and stored-plan latency
+#
+#   python benchmarks/bench_plan_store.py --requests 2000
+#
+# Plans random requests with shuffled subcategories (and weights for some of them)
+# through a fresh PlanStore twice: the first pass misses, the second is served from the
+# database. Fails (exit status 1) when any response differs from calculate_total_drinks
+# for the caller's own request; reports both passes' latency per request.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.categories import CATEGORY_MAP  # noqa: E402
+from app.plan_store import PlanStore  # noqa: E402
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+
+
+def make_requests(count, seed):
+    rng = random.Random(seed)
+    # The leftover units of a 40-unit split go to the first subcategories in caller order
+    requests = [(10, 20, {"BEER": ["LAGER", "IPA", "ALE"]}, None)]
+    for _ in range(count - 1):
+        categories = {}
+        for category in rng.sample(sorted(CATEGORY_MAP), rng.randint(1, len(CATEGORY_MAP))):
+            subcategories = rng.sample(CATEGORY_MAP[category], rng.randint(1, len(CATEGORY_MAP[category])))
+            categories[category] = subcategories
+        weights = None
+        if rng.random() < 0.3:
+            weights = {sub: rng.choice([1, 2, 3, 0.5, 2.5]) for subs in categories.values() for sub in subs}
+        requests.append((rng.randint(5, 500), rng.choice([10, 15, 20, 35.5]), categories, weights))
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    requests = make_requests(args.requests, args.seed)
+    store = PlanStore(os.path.join(tempfile.mkdtemp(), "plans.db"))
+
+    failures = 0
+    for label in ("miss", "hit"):
+        start = time.perf_counter()
+        results = store.plan_many(engine, requests)
+        elapsed = time.perf_counter() - start
+        for request, result in zip(requests, results):
+            expected = engine.calculate_total_drinks(*request)
+            if result != expected:
+                failures += 1
+                if failures <= 5:
+                    print(f"FAIL {label} {request}: store {result}, engine {expected}")
+        print(f"{label}:  {elapsed / len(requests) * 1e6:8.1f} us/request")
+    print(f"store:  {store.hits} hits, {store.misses} misses")
+    store.close()
+
+    if failures:
+        print(f"FAIL {failures} responses differ from calculate_total_drinks")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Latency of optimize_plan on a synthetic catalog, and the knapsack DP against brute force
+#
+#   python benchmarks/bench_product_optimizer.py --skus 300000 --plans 2000 --time-budget-ms 5
+#
+# Plans random events with up to 15 subcategories per category and reports optimize_plan
+# latency percentiles and how many category plans fell back to the greedy plan
+# (exact=False). Fails (exit status 1) when a plan spends more than its category budget
+# or p99 exceeds the time budget by more than --slack-ms. Separately, small instances
+# (2-4 subcategories, budgets from 30% to 120% of the category budget) are solved by
+# enumerating every choice: the DP must fit the budget and score at least as well as
+# the best plan that leaves one bucket of slack per subcategory, which is what its
+# budget discretization guarantees.
+import argparse
+import itertools
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.catalog import Catalog, write_catalog  # noqa: E402
+from app.categories import CATEGORY_MAP  # noqa: E402
+from app.product_optimizer import (_candidates, _Group, _knapsack, _score, optimize_plan,  # noqa: E402
+                                   units_per_sku)
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+from bench_catalog import synthetic_skus  # noqa: E402
+
+ENGINE_CATEGORIES = ("LIQUOR", "WINE", "BEER")
+RESOLUTION = 512
+
+
+def make_events(count, seed, most):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        chosen = [cat for cat in ENGINE_CATEGORIES if rng.random() < 0.7] or ["BEER"]
+        categories = {cat: rng.sample(CATEGORY_MAP[cat], rng.randint(1, min(most, len(CATEGORY_MAP[cat]))))
+                      for cat in chosen}
+        events.append((rng.randint(20, 2000), rng.randint(10, 100), categories))
+    return events
+
+
+def brute_force(groups, budget):
+    # Best score over every choice (None or one candidate per group) costing at most budget
+    best = None
+    for choice in itertools.product(*[[None] + list(range(len(group.rows))) for group in groups]):
+        cost = sum(groups[g].costs[pick] for g, pick in enumerate(choice) if pick is not None)
+        if cost <= budget:
+            score = _score(groups, choice)
+            if best is None or score > best:
+                best = score
+    return best
+
+
+def check_brute_force(engine, catalog, count, seed):
+    # (instances checked, instances where the DP matched the unrestricted optimum)
+    rng = random.Random(seed)
+    matched = 0
+    for number, (attendees, per_person_budget, categories) in enumerate(make_events(count, seed, 4)):
+        results = engine.calculate_total_drinks(attendees, per_person_budget, categories)
+        budgets = engine.category_budgets(attendees, per_person_budget, categories)
+        item = rng.choice(results["data"])
+        category = item["category"]
+        budget = budgets[category] * rng.uniform(0.3, 1.2)
+        sku_units = units_per_sku(engine.compiled, category)
+        target_price = item["per_unit_cost"] * sku_units
+        groups = []
+        for subcategory, units in item["subcategories"].items():
+            rows = _candidates(catalog, category, subcategory, target_price)
+            groups.append(_Group(subcategory, math.ceil(units / sku_units), rows,
+                                 [catalog.prices[row] for row in rows], target_price))
+
+        choice = _knapsack(groups, budget, RESOLUTION, math.inf)
+        spent = sum(groups[g].costs[pick] for g, pick in enumerate(choice) if pick is not None)
+        if spent > budget:
+            raise AssertionError(f"instance {number}: DP spends {spent:.2f} of {budget:.2f}")
+        score = _score(groups, choice)
+        guaranteed = brute_force(groups, budget - len(groups) * budget / RESOLUTION)
+        if guaranteed is not None and (score[0] < guaranteed[0]
+                                       or (score[0] == guaranteed[0] and score[1] < guaranteed[1] - 1e-9)):
+            raise AssertionError(f"instance {number}: DP scores {score}, brute force {guaranteed}")
+        optimum = brute_force(groups, budget)
+        if score[0] == optimum[0] and abs(score[1] - optimum[1]) <= 1e-9:
+            matched += 1
+    return count, matched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=300000)
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--brute-force", type=int, default=300, help="small instances checked by enumeration")
+    parser.add_argument("--time-budget-ms", type=float, default=5.0)
+    parser.add_argument("--slack-ms", type=float, default=1.0, help="allowed p99 over the time budget")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.skucat")
+    write_catalog(path, synthetic_skus(args.skus, args.seed))
+    catalog = Catalog(path)
+    engine = RecommendationEngine()
+
+    checked, matched = check_brute_force(engine, catalog, args.brute_force, args.seed)
+
+    events = make_events(args.plans, args.seed, 15)
+    timings = []
+    inexact = 0
+    category_plans = 0
+    for attendees, per_person_budget, categories in events:
+        start = time.perf_counter()
+        plan = optimize_plan(engine, catalog, attendees, per_person_budget, categories,
+                             time_budget_ms=args.time_budget_ms)
+        timings.append((time.perf_counter() - start) * 1000)
+        for products in plan["products"]:
+            category_plans += 1
+            inexact += not products["exact"]
+            if products["spent"] > products["budget"]:
+                raise AssertionError(f"{products['category']} plan spends {products['spent']} "
+                                     f"of {products['budget']}")
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+
+    print(f"catalog:          {len(catalog):,} SKUs")
+    print(f"brute force:      {checked} instances, DP within its guarantee on all, "
+          f"unrestricted optimum on {matched}")
+    print(f"optimize_plan:    p50 {statistics.median(timings):.2f} ms   p99 {p99:.2f} ms   max {timings[-1]:.2f} ms "
+          f"(time budget {args.time_budget_ms} ms)")
+    print(f"inexact:          {inexact} of {category_plans} category plans")
+    catalog.close()
+
+    if p99 > args.time_budget_ms + args.slack_ms:
+        print(f"FAIL p99 {p99:.2f} ms exceeds the {args.time_budget_ms} ms time budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
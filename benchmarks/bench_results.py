@@ -0,0 +1,57 @@
+# Compares result encodings: indented JSON (recommend_products' original output), compact
+# JSON, per-plan binary records and one columnar buffer; checks every encoding round-trips
+#
+#   python benchmarks/bench_results.py --events 20000
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+from app.results import ColumnarPlans, PlanResult, encode_binary, encode_columnar, iter_binary, to_json  # noqa: E402
+from bench_batch import make_events  # noqa: E402
+
+
+def timed(function):
+    start = time.perf_counter()
+    value = function()
+    return value, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    results = [engine.calculate_total_drinks(*event) for event in make_events(args.events, args.seed)]
+    plans = [PlanResult.from_dict(result) for result in results]
+
+    pretty, pretty_seconds = timed(lambda: [json.dumps(result, indent=4) for result in results])
+    compact, compact_seconds = timed(lambda: [to_json(result) for result in results])
+    binary, binary_seconds = timed(lambda: b"".join(encode_binary(plan) for plan in plans))
+    columnar, columnar_seconds = timed(lambda: encode_columnar(plans))
+
+    if [json.loads(text) for text in compact] != results:
+        raise AssertionError("compact JSON does not round-trip")
+    if list(iter_binary(binary)) != plans:
+        raise AssertionError("binary records do not round-trip")
+    decoded, read_seconds = timed(lambda: list(ColumnarPlans(columnar)))
+    if decoded != plans:
+        raise AssertionError("columnar buffer does not round-trip")
+
+    print(f"plans:           {args.events}")
+    for name, size, seconds in (("indented json", sum(map(len, pretty)), pretty_seconds),
+                                ("compact json", sum(map(len, compact)), compact_seconds),
+                                ("binary", len(binary), binary_seconds),
+                                ("columnar", len(columnar), columnar_seconds)):
+        print(f"{name + ':':<16} {size / args.events:7.1f} bytes/plan  {args.events / seconds:>12,.0f} plans/sec")
+    print(f"columnar read:   {args.events / read_seconds:,.0f} plans/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Cold start benchmark: fresh interpreters importing the engine and planning once
+#
+#   python benchmarks/bench_startup.py --runs 20
+#   python benchmarks/bench_startup.py --record benchmarks/startup_history.jsonl
+#   python benchmarks/bench_startup.py --check benchmarks/startup_history.jsonl --threshold 0.25
+#
+# Every run is a new `python -c` process that times `import app.recommendation_engine`,
+# building a RecommendationEngine plus its first calculate_total_drinks, and lists the
+# non-stdlib modules the import pulled in. The bare interpreter start is measured the same
+# way and reported separately. --record appends the medians to a JSONL history so cold
+# start can be followed across commits; --check exits with status 1 when import or first
+# plan time grows by more than --threshold over the median of the last --window entries,
+# or when the engine import loads anything outside the standard library.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Non-stdlib top level modules loaded in the probing interpreter
+THIRD_PARTY = 'sorted({name.split(".")[0] for name in sys.modules} - set(sys.stdlib_module_names) - {"app", "__main__"})'
+
+BARE_PROBE = f"import sys, json; print(json.dumps({THIRD_PARTY}))"
+
+PROBE = f"""
+import sys, time, json
+started = time.perf_counter()
+import app.recommendation_engine
+imported = time.perf_counter()
+engine = app.recommendation_engine.RecommendationEngine()
+engine.calculate_total_drinks(50, 20, {{"LIQUOR": ["WHISKEY"], "WINE": ["RED WINE"], "BEER": ["IPA"]}})
+planned = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "first_plan_ms": (planned - imported) * 1000,
+                  "third_party": {THIRD_PARTY}}}))
+"""
+
+
+def run(code):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO, check=True, capture_output=True, text=True).stdout
+    return (time.perf_counter() - started) * 1000, output
+
+
+def measure(runs):
+    bare = [run(BARE_PROBE) for _ in range(runs)]
+    samples = []
+    for _ in range(runs):
+        wall_ms, output = run(PROBE)
+        samples.append(dict(json.loads(output), wall_ms=wall_ms))
+    # Site hooks (e.g. setuptools' distutils hack) may preload modules in every interpreter
+    preloaded = set(json.loads(bare[0][1]))
+    return {
+        "interpreter_ms": statistics.median(wall_ms for wall_ms, _ in bare),
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "first_plan_ms": statistics.median(sample["first_plan_ms"] for sample in samples),
+        "wall_ms": statistics.median(sample["wall_ms"] for sample in samples),
+        "third_party": sorted(set().union(*(sample["third_party"] for sample in samples)) - preloaded),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO, check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20, help="fresh interpreters per measurement")
+    parser.add_argument("--record", metavar="PATH", help="append this run to a JSONL history")
+    parser.add_argument("--check", metavar="PATH", help="history to check for regressions")
+    parser.add_argument("--window", type=int, default=5, help="history entries the check compares against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="slowdowns smaller than this are ignored as noise")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"interpreter start:   {result['interpreter_ms']:7.1f} ms")
+    print(f"import engine:       {result['import_ms']:7.1f} ms")
+    print(f"first plan:          {result['first_plan_ms']:7.1f} ms")
+    print(f"process wall time:   {result['wall_ms']:7.1f} ms")
+    print(f"non-stdlib imports:  {', '.join(result['third_party']) or 'none'}")
+
+    failures = []
+    if result["third_party"]:
+        failures.append(f"importing the engine loaded {', '.join(result['third_party'])}")
+    if args.check:
+        history = read_history(args.check)[-args.window:]
+        if history:
+            for key in ("import_ms", "first_plan_ms"):
+                reference = statistics.median(entry[key] for entry in history)
+                if result[key] > reference * (1 + args.threshold) and result[key] - reference > args.min_delta_ms:
+                    failures.append(f"{key} {result[key]:.1f} vs {reference:.1f} over the last {len(history)} runs")
+
+    if args.record:
+        entry = dict(result, timestamp=time.time(), commit=git_commit(), python=platform.python_version(),
+                     runs=args.runs)
+        with open(args.record, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"recorded in {args.record}")
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    if args.check:
+        print(f"no regressions against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
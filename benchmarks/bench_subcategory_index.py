@@ -0,0 +1,97 @@
+# Search latency of SubcategoryIndex over a synthetic taxonomy of thousands of names
+#
+#   python benchmarks/bench_subcategory_index.py --size 5000
+#
+# Names are built from the words of CATEGORY_MAP. Queries are words of random names:
+# whole, as prefixes, with one typo and in reversed word order. Every query is checked
+# against a linear scan that applies the same matching rules to every name.
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.categories import CATEGORY_MAP  # noqa: E402
+from app.subcategory_index import SubcategoryIndex, edit_distance, max_edits, tokens  # noqa: E402
+
+
+def make_taxonomy(size, seed):
+    rng = random.Random(seed)
+    words = sorted({word.upper() for names in CATEGORY_MAP.values() for name in names for word in tokens(name)})
+    taxonomy = {category: list(names) for category, names in CATEGORY_MAP.items()}
+    categories = list(taxonomy)
+    while sum(map(len, taxonomy.values())) < size:
+        name = " ".join(rng.sample(words, rng.randint(2, 4)))
+        names = taxonomy[rng.choice(categories)]
+        if name not in names:
+            names.append(name)
+    return taxonomy
+
+
+def make_queries(index, count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = tokens(rng.choice(index.entries).name)
+        kind = rng.choice(["exact", "prefix", "typo", "reversed"])
+        if kind == "prefix":
+            words = [words[0][:max(1, len(words[0]) // 2)]]
+        elif kind == "typo" and len(words[0]) > 3:
+            position = rng.randrange(len(words[0]))
+            words = [words[0][:position] + "x" + words[0][position + 1:]]
+        elif kind == "reversed":
+            words = words[::-1]
+        queries.append((kind, " ".join(words)))
+    return queries
+
+
+def word_matches(word, other):
+    limit = max_edits(word)
+    return word == other or other.startswith(word) or (limit and edit_distance(word, other, limit) <= limit)
+
+
+def linear_matches(index, query):
+    # Entries matching every query word, comparing each query word with every word of
+    # every name (each distinct word once) instead of using the index
+    names = [{word for name in (subcategory.name,) + subcategory.aliases for word in tokens(name)}
+             for subcategory in index.entries]
+    vocabulary = set().union(*names)
+    matching = [{other for other in vocabulary if word_matches(word, other)} for word in tokens(query)]
+    return {entry for entry, words in enumerate(names) if all(words & matched for matched in matching)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=5000, help="subcategories in the taxonomy")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    taxonomy = make_taxonomy(args.size, args.seed)
+    start = time.perf_counter()
+    index = SubcategoryIndex(taxonomy, cache_size=0)
+    build_seconds = time.perf_counter() - start
+    queries = make_queries(index, args.queries, args.seed)
+
+    timings = {}
+    for kind, query in queries:
+        start = time.perf_counter()
+        page = index.page(query, None, 0, 30)
+        timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+        expected = linear_matches(index, query)
+        found = {index._canonical[(item.category, item.name)] for item in index.search(query)}
+        if found != expected or page.total != len(expected):
+            raise AssertionError(f"{kind} query {query!r}: index found {len(found)}, linear scan {len(expected)}")
+
+    print(f"subcategories:   {len(index)} ({sum(map(len, taxonomy.values()))} names)")
+    print(f"build:           {build_seconds * 1000:.1f} ms")
+    for kind, samples in sorted(timings.items()):
+        samples.sort()
+        print(f"{kind:<16} p50 {statistics.median(samples):6.3f} ms   p99 {samples[int(len(samples) * 0.99)]:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compares looping calculate_total_drinks over an attendees x budget grid against
+# RecommendationEngine.sweep, and checks both agree on every cell
+#
+#   python benchmarks/bench_sweep.py --attendees 200 --budgets 200
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.recommendation_engine import RecommendationEngine  # noqa: E402
+
+CATEGORIES = {
+    "LIQUOR": ["WHISKEY", "VODKA", "GIN"],
+    "WINE": ["RED WINE", "WHITE WINE"],
+    "BEER": ["IPA", "LAGER", "STOUT"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--attendees", type=int, default=200)
+    parser.add_argument("--budgets", type=int, default=200)
+    parser.add_argument("--max-cells", type=int, default=1 << 16, help="block size for the streamed sweep")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    attendees = range(1, args.attendees + 1)
+    budgets = range(1, args.budgets + 1)
+    cells = len(attendees) * len(budgets)
+    # The engine imports numpy on first use; keep that out of the timings
+    engine.sweep(range(1, 2), range(1, 2), CATEGORIES)
+
+    start = time.perf_counter()
+    loop = [[engine.calculate_total_drinks(n, b, CATEGORIES) for b in budgets] for n in attendees]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grid = engine.sweep(attendees, budgets, CATEGORIES)
+    sweep_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in engine.iter_sweep(attendees, budgets, CATEGORIES, max_cells=args.max_cells):
+        pass
+    streamed_seconds = time.perf_counter() - start
+
+    for i, row in enumerate(loop):
+        for j, result in enumerate(row):
+            for item in result["data"]:
+                column = grid["data"][item["category"]]
+                if (column["total_units"][i, j] != item["total_units"]
+                        or column["per_unit_cost"][i, j] != item["per_unit_cost"]):
+                    raise AssertionError(f"cell ({attendees[i]}, {budgets[j]}) {item['category']} differs")
+
+    print(f"cells:           {cells}")
+    print(f"per-cell loop:   {cells / loop_seconds:,.0f} cells/sec")
+    print(f"sweep:           {cells / sweep_seconds:,.0f} cells/sec")
+    print(f"streamed sweep:  {cells / streamed_seconds:,.0f} cells/sec")
+    print(f"speedup:         {loop_seconds / sweep_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()